@@ -4,10 +4,151 @@ API client for healthcare patient data.
 This module handles all API calls to the patient management system.
 """
 
+import asyncio
+import hashlib
+import re
 import httpx
-from typing import List, Dict, Any, Optional
+import orjson
+from cachetools import LRUCache, TTLCache
+from functools import lru_cache, partial
+from typing import List, Dict, Any, Optional, Tuple
 from config import API_CONFIG, FIELD_MAPPING, QUERY_PARAM_MAPPING
 
+# Alias tuples per standard field name, and the reverse lookup from every alias
+_RESOLVERS = {canonical: tuple(aliases) for canonical, aliases in FIELD_MAPPING.items()}
+_REVERSE_MAP = {alias: canonical for canonical, aliases in _RESOLVERS.items() for alias in aliases}
+# Position of every alias in its field's list; earlier aliases win when a record has several
+_ALIAS_RANK = {alias: rank for aliases in _RESOLVERS.values() for rank, alias in enumerate(aliases)}
+# Fields that APIs may send as arrays; they are joined into strings on ingestion
+_LIST_FIELDS = frozenset({"medications", "allergies"})
+
+# Display template for one patient; optional lines are only filled in when present
+_PATIENT_TEMPLATE = (
+    "📋 Patient #%(i)d\n"
+    "   👤 Name: %(name)s\n"
+    "   🆔 ID: %(id)s\n"
+    "   🎂 Age: %(age)s\n"
+    "%(optional)s"
+)
+_OPTIONAL_LINES = (
+    # Medical information
+    ("diagnosis", "   🏥 Diagnosis: %s\n", str),
+    ("medications", "   💊 Medications: %s\n", str),
+    ("allergies", "   ⚠️  Allergies: %s\n", str),
+    ("last_updated", "   📅 Last Updated: %s\n", str),
+    # Legacy fields (if available)
+    ("department", "   🏢 Department: %s\n", str.title),
+    ("status", "   📊 Status: %s\n", str.title),
+    ("admission_date", "   📆 Admitted: %s\n", str),
+)
+
+# Bodies larger than this are scanned as they arrive so reading can stop once enough
+# records are in (the API ignored the limit); smaller ones are decoded in one go
+_SCAN_THRESHOLD = 64 * 1024
+# Key of the patient array in wrapped responses. A "data" array only wins once the
+# whole body shows there is no "patients" key, so it is never read early
+_PATIENTS_KEY = b'"patients"'
+# String literals, brackets and colons are the only tokens needed to follow the
+# structure; a string cut off at the end of the buffer is matched as "partial"
+_JSON_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|(?P<partial>"(?:[^"\\]|\\.)*\\?\Z)|[\[\]{}:]')
+
+
+@lru_cache(maxsize=64)
+def _detect_schema(keys: Tuple[str, ...]) -> Tuple[Tuple[int, str], ...]:
+    """Map a record layout's key positions to standard field names, once per distinct layout."""
+    # Lowest precedence first, so the preferred alias of a field is assigned last and wins
+    positions = sorted(range(len(keys)), key=lambda i: _ALIAS_RANK.get(keys[i], len(_ALIAS_RANK)), reverse=True)
+    return tuple((i, _REVERSE_MAP.get(keys[i], keys[i])) for i in positions)
+
+
+class _PatientArrayScanner:
+    """
+    Incrementally decode the leading patient records of a large JSON response body.
+    
+    Bytes are fed in as they arrive. Each record of a top-level array, or of the
+    "patients" array of a wrapped response, is decoded as soon as its closing bracket
+    is seen. Bodies a full decode could read differently (scalar items, a "patients"
+    value that is not an array, "data" arrays) never become conclusive, so they are
+    read to the end and decoded in full.
+    """
+    
+    def __init__(self):
+        self._buf = bytearray()
+        self._pos = 0  # Position scanning resumes from
+        self._depth = 0
+        self._key = None  # Last string seen directly inside the top-level object
+        self._pending = False  # Whether the "patients" array is expected next
+        self._array_depth = None  # Depth of the records of the patient array
+        self._item_start = None
+        self._item_end = None  # End of the previous record, or just past the "["
+        self._closed = False
+        self._valid = True
+        self.records = None  # Decoded records, once a patient array is found
+    
+    def enough(self, limit: int) -> bool:
+        """Whether reading can stop: the patient array is complete or already has limit records."""
+        return (self._valid and self.records is not None
+                and (self._closed or len(self.records) >= limit))
+    
+    def feed(self, chunk: bytes):
+        """Scan another chunk of the body, decoding every record it completes."""
+        buf = self._buf
+        buf += chunk
+        if self._closed or not self._valid:
+            return
+        
+        for match in _JSON_TOKEN.finditer(buf, self._pos):
+            if match.lastgroup == "partial":
+                # Wait for the rest of the string
+                self._pos = match.start()
+                break
+            token = match.group()
+            self._pos = match.end()
+            
+            if token == b"[" or token == b"{":
+                if self.records is None:
+                    if token == b"[" and (self._depth == 0 or (self._depth == 1 and self._pending)):
+                        self.records = []
+                        self._array_depth = self._depth + 1
+                        self._item_end = match.end()
+                elif self._depth == self._array_depth:
+                    self._check_gap(match.start(), b"," if self.records else b"")
+                    self._item_start = match.start()
+                self._pending = False
+                self._depth += 1
+            elif token == b"]" or token == b"}":
+                self._depth -= 1
+                self._pending = False
+                if self.records is not None:
+                    if self._depth == self._array_depth and self._item_start is not None:
+                        self.records.append(orjson.loads(buf[self._item_start:match.end()]))
+                        self._item_start = None
+                        self._item_end = match.end()
+                    elif self._depth < self._array_depth:
+                        self._check_gap(match.start(), b"")
+                        self._closed = True
+            elif token == b":":
+                self._pending = self._depth == 1 and self._key == _PATIENTS_KEY
+                self._key = None
+            elif self.records is not None and self._depth == self._array_depth:
+                # A string record: leave it to the full decode
+                self._valid = False
+            elif self._depth == 1:
+                self._key = token
+                self._pending = False
+            
+            if self._closed or not self._valid:
+                break
+    
+    def _check_gap(self, end: int, expected: bytes):
+        """Require only a separator between records, so no scalar items are skipped."""
+        if self._buf[self._item_end:end].strip() != expected:
+            self._valid = False
+    
+    def body(self) -> bytes:
+        """The whole body, for responses that must be decoded in full."""
+        return bytes(self._buf)
+
 
 class PatientAPIClient:
     """Client for interacting with the patient management API."""
@@ -17,9 +158,24 @@ class PatientAPIClient:
         self.base_url = API_CONFIG["base_url"]
         self.timeout = API_CONFIG.get("timeout", 30)
         self.auth_config = API_CONFIG.get("auth", {})
+        self.max_retries = API_CONFIG.get("max_retries", 0)
+        self.http2 = API_CONFIG.get("http2", False)
+        self.ndjson = API_CONFIG.get("ndjson", False)
+        self.case_insensitive_names = API_CONFIG.get("case_insensitive_names", True)
+        self._headers = self._build_headers()
+        # Formatted responses keyed by (patient_name, limit)
+        cache_config = API_CONFIG.get("cache", {})
+        self._cache = TTLCache(maxsize=cache_config.get("maxsize", 256), ttl=cache_config.get("ttl", 60))
+        # Formatted output keyed by a digest of the raw records, reused across queries
+        self._formatted = LRUCache(maxsize=256)
+        # Shared HTTP client, created lazily inside the running event loop
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        # In-flight requests by normalized patient name, as (limit, task)
+        self._inflight: Dict[str, Tuple[int, asyncio.Task]] = {}
     
-    def _get_headers(self) -> Dict[str, str]:
-        """Get HTTP headers including authentication."""
+    def _build_headers(self) -> Dict[str, str]:
+        """Build HTTP headers including authentication."""
         headers = {
             "Content-Type": "application/json",
         }
@@ -33,79 +189,206 @@ class PatientAPIClient:
         
         return headers
     
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Get the shared HTTP client for the running event loop.
+        
+        Pooled connections are bound to the loop that opened them, so the client
+        is (re)created whenever it is first used from a different event loop.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            # Release the replaced client's sockets on the loop that owns them
+            old_client, old_loop = self._client, self._client_loop
+            if old_client is not None and not old_loop.is_closed():
+                asyncio.run_coroutine_threadsafe(old_client.aclose(), old_loop)
+            
+            # HTTP/2 multiplexes concurrent requests over a single connection
+            transport = httpx.AsyncHTTPTransport(
+                http2=self.http2,
+                retries=self.max_retries,
+                limits=httpx.Limits(max_keepalive_connections=20, keepalive_expiry=30),
+            )
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                headers=self._headers,
+                transport=transport,
+            )
+            self._client_loop = loop
+        return self._client
+    
+    async def aclose(self):
+        """Close the shared HTTP client and release its pooled connections."""
+        client, loop = self._client, self._client_loop
+        self._client = None
+        self._client_loop = None
+        # Connections owned by an already closed loop cannot be closed gracefully
+        if client is not None and not loop.is_closed():
+            await client.aclose()
+    
+    def clear_cache(self):
+        """Drop all cached patient list responses."""
+        self._cache.clear()
+        self._formatted.clear()
+    
     def _get_field_value(self, patient_data: Dict[str, Any], field_name: str) -> Any:
         """Get field value using field mapping configuration."""
-        possible_names = FIELD_MAPPING.get(field_name, [field_name])
-        for name in possible_names:
+        for name in _RESOLVERS.get(field_name, (field_name,)):
             if name in patient_data and patient_data[name] is not None:
                 value = patient_data[name]
                 # Return the actual value (could be string, list, etc.)
                 return value
         return "N/A" if field_name != "name" else "Unknown"
     
+    def _decode_patients(self, raw: bytes) -> List[Dict[str, Any]]:
+        """Decode a JSON response body into a list of patient records."""
+        data = orjson.loads(raw) if raw else []
+        
+        # Handle different API response formats
+        if isinstance(data, list):
+            return data
+        elif isinstance(data, dict) and "patients" in data:
+            return data["patients"]
+        elif isinstance(data, dict) and "data" in data:
+            return data["data"]
+        else:
+            return [data] if data else []
+    
+    async def _read_json(self, response: httpx.Response, limit: int) -> List[Dict[str, Any]]:
+        """Read patient records from a JSON body, stopping early on large bodies once limit are decoded."""
+        chunks = response.aiter_bytes()
+        body = bytearray()
+        async for chunk in chunks:
+            body += chunk
+            if len(body) >= _SCAN_THRESHOLD:
+                break
+        else:
+            return self._decode_patients(bytes(body))
+        
+        # A large body usually means the API ignored the limit; scan the rest as it arrives
+        scanner = _PatientArrayScanner()
+        scanner.feed(body)
+        if not scanner.enough(limit):
+            async for chunk in chunks:
+                scanner.feed(chunk)
+                if scanner.enough(limit):
+                    break
+        
+        if scanner.enough(limit):
+            return scanner.records
+        return self._decode_patients(scanner.body())
+    
+    async def _read_ndjson(self, response: httpx.Response, limit: int) -> List[Dict[str, Any]]:
+        """Read patient records from a newline-delimited JSON stream, stopping at limit."""
+        patients = []
+        async for line in response.aiter_lines():
+            if line.strip():
+                patients.append(orjson.loads(line))
+                if len(patients) >= limit:
+                    break
+        return patients
+    
+    def _normalize_patient(self, patient: Dict[str, Any]) -> Dict[str, Any]:
+        """Rename a raw patient record's fields to standard field names in a single pass."""
+        values = tuple(patient.values())
+        fields = {canonical: values[i] for i, canonical in _detect_schema(tuple(patient)) if values[i] is not None}
+        
+        # Pre-join array fields so formatting can use every value as-is
+        for key in _LIST_FIELDS & fields.keys():
+            value = fields[key]
+            if isinstance(value, list):
+                fields[key] = ", ".join(value)
+        return fields
+    
     def _format_patient_list(self, patients: List[Dict[str, Any]]) -> str:
         """Format patient list into a readable string with comprehensive patient information."""
         if not patients:
             return "No patients found matching the specified criteria."
 
-        response_lines = [f"Found {len(patients)} patient(s):\n"]
-
-        for i, patient in enumerate(patients, 1):
-            # Basic information
-            patient_id = self._get_field_value(patient, "id")
-            name = self._get_field_value(patient, "name")
-            age = self._get_field_value(patient, "age")
-
-            # Medical information
-            diagnosis = self._get_field_value(patient, "diagnosis")
-            medications = self._get_field_value(patient, "medications")
-            allergies = self._get_field_value(patient, "allergies")
-            last_updated = self._get_field_value(patient, "last_updated")
-
-            # Legacy fields (for backward compatibility)
-            dept = self._get_field_value(patient, "department")
-            status = self._get_field_value(patient, "status")
-            admission_date = self._get_field_value(patient, "admission_date")
-
-            # Format patient entry
-            response_lines.append(f"📋 Patient #{i}")
-            response_lines.append(f"   👤 Name: {name}")
-            response_lines.append(f"   🆔 ID: {patient_id}")
-            response_lines.append(f"   🎂 Age: {age}")
-
-            if diagnosis != "N/A":
-                response_lines.append(f"   🏥 Diagnosis: {diagnosis}")
-
-            if medications != "N/A":
-                # Handle medications array
-                if isinstance(medications, list):
-                    meds_str = ", ".join(medications)
-                else:
-                    meds_str = str(medications)
-                response_lines.append(f"   💊 Medications: {meds_str}")
-
-            if allergies != "N/A":
-                # Handle allergies array
-                if isinstance(allergies, list):
-                    allergies_str = ", ".join(allergies)
-                else:
-                    allergies_str = str(allergies)
-                response_lines.append(f"   ⚠️  Allergies: {allergies_str}")
-
-            if last_updated != "N/A":
-                response_lines.append(f"   📅 Last Updated: {last_updated}")
-
-            # Legacy fields (if available)
-            if dept != "N/A":
-                response_lines.append(f"   🏢 Department: {dept.title()}")
-            if status != "N/A":
-                response_lines.append(f"   📊 Status: {status.title()}")
-            if admission_date != "N/A":
-                response_lines.append(f"   📆 Admitted: {admission_date}")
-
-            response_lines.append("")  # Empty line between patients
-
-        return "\n".join(response_lines)
+        # Identical record lists (e.g. overlapping queries) are only formatted once
+        digest = hashlib.blake2b(orjson.dumps(patients), digest_size=16).digest()
+        formatted = self._formatted.get(digest)
+        if formatted is None:
+            formatted = self._formatted[digest] = self._render_patient_list(patients)
+        return formatted
+    
+    def _render_patient_list(self, patients: List[Dict[str, Any]]) -> str:
+        """Render a non-empty patient list with one template block per patient."""
+        # Normalize all records up front so the formatting loop is branch-free
+        records = [self._normalize_patient(patient) for patient in patients]
+        
+        header = f"Found {len(records)} patient(s):\n\n"
+        # Patients are separated by an empty line
+        return header + "\n".join(
+            _PATIENT_TEMPLATE % self._display_fields(i, fields)
+            for i, fields in enumerate(records, 1)
+        )
+    
+    def _display_fields(self, i: int, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the substitutions for _PATIENT_TEMPLATE from a normalized patient record."""
+        return {
+            "i": i,
+            "name": fields.get("name", "Unknown"),
+            "id": fields.get("id", "N/A"),
+            "age": fields.get("age", "N/A"),
+            "optional": "".join([
+                line % convert(fields[key])
+                for key, line, convert in _OPTIONAL_LINES
+                if key in fields
+            ]),
+        }
+    
+    async def _fetch_patients(self, patient_name: Optional[str], limit: int) -> Tuple[httpx.Response, Optional[List[Any]]]:
+        """Request patient records from the API; the records are None unless the status is 200."""
+        # Prepare query parameters
+        params = {}
+        if patient_name:
+            # Use the configured parameter name for patient name filtering
+            param_name = QUERY_PARAM_MAPPING.get("patient_name", "name")
+            params[param_name] = patient_name
+        params["limit"] = limit
+        
+        # Make HTTP request over the shared keep-alive connection pool
+        client = self._get_client()
+        endpoint = API_CONFIG['endpoints']['patients']
+        patients = None
+        # Stream records and stop reading once the limit is reached
+        headers = {"Accept": "application/x-ndjson"} if self.ndjson else None
+        async with client.stream("GET", endpoint, params=params, headers=headers) as response:
+            if response.status_code != 200:
+                await response.aread()
+            elif "ndjson" in response.headers.get("content-type", ""):
+                patients = await self._read_ndjson(response, limit)
+            else:
+                patients = await self._read_json(response, limit)
+        return response, patients
+    
+    async def _fetch_shared(self, patient_name: Optional[str], limit: int) -> Tuple[httpx.Response, Optional[List[Any]]]:
+        """Fetch patient records, joining an in-flight request for the same name that covers limit."""
+        key = self._name_key(patient_name)
+        loop = asyncio.get_running_loop()
+        entry = self._inflight.get(key)
+        if entry is None or entry[0] < limit or entry[1].get_loop() is not loop:
+            task = loop.create_task(self._fetch_patients(patient_name, limit))
+            entry = self._inflight[key] = (limit, task)
+            task.add_done_callback(partial(self._forget_inflight, key, entry))
+        # Shielded so one caller giving up does not cancel the request for the others
+        return await asyncio.shield(entry[1])
+    
+    def _forget_inflight(self, key: str, entry: Tuple[int, asyncio.Task], task: asyncio.Task):
+        """Stop sharing a finished request."""
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+        # Mark the error as seen even if every caller stopped waiting
+        if not task.cancelled():
+            task.exception()
+    
+    def _name_key(self, patient_name: Optional[str]) -> str:
+        """Key a stripped patient name the way the API compares names."""
+        if not patient_name:
+            return ""
+        return patient_name.casefold() if self.case_insensitive_names else patient_name
     
     async def get_patient_list(self, patient_name: Optional[str] = None, limit: int = 10) -> str:
         """
@@ -122,45 +405,36 @@ class PatientAPIClient:
             Exception: If API call fails or returns invalid data
         """
         try:
-            # Build endpoint URL
-            endpoint = f"{self.base_url}{API_CONFIG['endpoints']['patients']}"
+            limit = min(max(limit, 1), 100)  # Ensure limit is between 1 and 100
             
-            # Prepare query parameters
-            params = {}
-            if patient_name:
-                # Use the configured parameter name for patient name filtering
-                param_name = QUERY_PARAM_MAPPING.get("patient_name", "name")
-                params[param_name] = patient_name
-            params["limit"] = min(max(limit, 1), 100)  # Ensure limit is between 1 and 100
+            # The stripped name is both sent upstream and used for the cache key
+            patient_name = (patient_name or "").strip() or None
             
-            # Make HTTP request
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(endpoint, params=params, headers=self._get_headers())
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    # Handle different API response formats
-                    if isinstance(data, list):
-                        patients = data
-                    elif isinstance(data, dict) and "patients" in data:
-                        patients = data["patients"]
-                    elif isinstance(data, dict) and "data" in data:
-                        patients = data["data"]
-                    else:
-                        patients = [data] if data else []
-                    
-                    return self._format_patient_list(patients)
+            # Serve repeated queries from the cache
+            cache_key = (self._name_key(patient_name), limit)
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                return cached
+            
+            response, patients = await self._fetch_shared(patient_name, limit)
+            
+            if response.status_code == 200:
+                # Enforce the limit even if the server returned more records
+                if patients:
+                    patients = patients[:limit]
+                result = self._format_patient_list(patients)
+                self._cache[cache_key] = result
+                return result
+            
+            else:
+                error_text = f"API request failed with status {response.status_code}"
+                try:
+                    error_data = response.text
+                    error_text += f": {error_data}"
+                except:
+                    pass
                 
-                else:
-                    error_text = f"API request failed with status {response.status_code}"
-                    try:
-                        error_data = response.text
-                        error_text += f": {error_data}"
-                    except:
-                        pass
-                    
-                    return f"Error: {error_text}"
+                return f"Error: {error_text}"
         
         except httpx.RequestError as e:
             return f"Network error: {str(e)}"
@@ -6,21 +6,49 @@ Integrates with MCP server to provide healthcare-related chat functionality.
 
 import os
 import sys
+import atexit
 import asyncio
-import json
-from flask import Flask, render_template, request, jsonify, make_response
+import concurrent.futures
+import hashlib
+import logging
+import queue
+import re
+import threading
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+import orjson
+from flask import Flask, Response, render_template, request, make_response, session, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_socketio import SocketIO, emit
-from groq_service import GroqService
+from groq_service import GroqService, DEFAULT_SESSION, STRICT_NAME_PATTERN, LIMIT_PATTERN, NAME_STOPWORDS
+from semantic_cache import SemanticCache
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Log records are handed to a background thread, so handlers never block on console output
+_log_queue = queue.SimpleQueue()
+_log_handler = QueueHandler(_log_queue)
+_log_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+# Libraries only log warnings: httpx's INFO lines would print every patient API
+# request URL, patient names included
+logging.basicConfig(level=logging.WARNING, handlers=[_log_handler])
+for _name in (__name__, 'groq_service'):
+    _app_logger = logging.getLogger(_name)
+    _app_logger.setLevel(logging.INFO)
+    _app_logger.addHandler(_log_handler)
+    _app_logger.propagate = False
+_log_listener = QueueListener(_log_queue, logging.StreamHandler())
+_log_listener.start()
+atexit.register(_log_listener.stop)
+logger = logging.getLogger(__name__)
+
 # Add parent directory to path to import MCP server modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 try:
-    from mcp_server import mcp
+    from mcp_server import mcp, getpatientlist
     from api_client import patient_api_client
     MCP_AVAILABLE = True
     print("✅ MCP server modules imported successfully")
@@ -34,16 +62,57 @@ except ImportError as e:
     mcp = DummyMCP()
     patient_api_client = DummyMCP()
 
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, used for request bodies and jsonify."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Threading mode, so results can be emitted from the background event loop thread
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode="threading")
+
+# Single background event loop shared by all requests, so async resources
+# such as the pooled patient API connections outlive individual requests
+CHAT_TIMEOUT = 120  # Seconds to wait for a chat message to be processed
+_loop = asyncio.new_event_loop()
+threading.Thread(target=_loop.run_forever, name="asyncio-loop", daemon=True).start()
+
+def run_async(coro, timeout=CHAT_TIMEOUT):
+    """Run a coroutine on the shared background loop and wait for its result."""
+    future = asyncio.run_coroutine_threadsafe(coro, _loop)
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        # Stop the coroutine instead of leaving it running for a caller that gave up
+        future.cancel()
+        raise TimeoutError(f"Timed out after {timeout} seconds") from None
+
+async def next_chunk(stream):
+    """Await the next item of an async generator, or None once it is exhausted."""
+    try:
+        return await stream.__anext__()
+    except StopAsyncIteration:
+        return None
 
-@app.after_request
-def add_security_headers(response):
-    """Add security headers for Teams integration."""
+def sse_event(payload):
+    """Encode a payload as a Server-Sent Events data frame."""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+def json_response(payload, status=200):
+    """Serialize a payload with orjson into a JSON response."""
+    return Response(orjson.dumps(payload), status=status, mimetype='application/json')
+
+# Security headers for Teams integration, built once and applied to every page
+SECURITY_HEADERS = (
     # Allow embedding in Teams iframe
-    response.headers['X-Frame-Options'] = 'ALLOW-FROM https://teams.microsoft.com'
-    response.headers['Content-Security-Policy'] = (
+    ('X-Frame-Options', 'ALLOW-FROM https://teams.microsoft.com'),
+    ('Content-Security-Policy', (
         "frame-ancestors 'self' https://teams.microsoft.com https://*.teams.microsoft.com "
         "https://*.skype.com https://*.microsoft.com; "
         "default-src 'self' https:; "
@@ -52,18 +121,34 @@ def add_security_headers(response):
         "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
         "img-src 'self' data: https:; "
         "connect-src 'self' ws: wss: https:;"
-    )
+    )),
     # Add CORS headers for Teams
-    response.headers['Access-Control-Allow-Origin'] = '*'
-    response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
-    response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+    ('Access-Control-Allow-Origin', '*'),
+    ('Access-Control-Allow-Methods', 'GET, POST, OPTIONS'),
+    ('Access-Control-Allow-Headers', 'Content-Type, Authorization'),
+)
+
+@app.after_request
+def add_security_headers(response):
+    """Add security headers for Teams integration."""
+    # Static assets are never framed, so they don't need the page policies
+    if request.endpoint == 'static':
+        return response
+    for name, value in SECURITY_HEADERS:
+        response.headers[name] = value
     return response
 
+# Most patients the chat UI usefully shows for one lookup
+MAX_CHAT_PATIENTS = 25
+# Questions about the results need the LLM to phrase an answer around the tool output
+RESULT_QUESTION_PATTERN = re.compile(r"^\s*(?:what|which|who|whose|does|do|is|are|how)\b|\?\s*$", re.IGNORECASE)
+
 class ChatbotMCPIntegration:
     """Integration layer between chatbot, Groq LLM, and MCP server."""
 
     def __init__(self):
         self.groq_service = GroqService(model_name="llama3-8b-8192")
+        self.semantic_cache = SemanticCache()
         self.available_tools = {
             'getpatientlist': self.get_patient_list
         }
@@ -76,20 +161,60 @@ class ChatbotMCPIntegration:
             return "❌ MCP server is not available. Please check the setup."
 
         try:
-            # Import the getpatientlist function from mcp_server
-            from mcp_server import getpatientlist
             result = await getpatientlist(patient_name=patient_name, limit=limit)
             return result
         except Exception as e:
             return f"Error getting patient list: {str(e)}"
 
-    async def process_message(self, message):
+    def speculate_patient_search(self, message):
+        """Start an obvious patient lookup before the LLM has confirmed it is needed."""
+        # Same rules as the intent fast path, so the lookup matches the parameters it picks
+        match = STRICT_NAME_PATTERN.search(message)
+        if not match or match.group(1).lower() in NAME_STOPWORDS:
+            return None, None
+
+        limit_match = LIMIT_PATTERN.search(message)
+        params = self.patient_search_params(match.group(1), limit_match.group(1) if limit_match else None)
+        task = asyncio.create_task(self.get_patient_list(patient_name=params[0], limit=params[1]))
+        return params, task
+
+    @staticmethod
+    def patient_search_params(patient_name, limit):
+        """Normalize patient search arguments, bounding the limit before the API is called."""
+        try:
+            limit = int(limit or 10)
+        except (TypeError, ValueError):
+            limit = 10
+        patient_name = patient_name.strip() if isinstance(patient_name, str) else None
+        return (patient_name or None, max(1, min(limit, MAX_CHAT_PATIENTS)))
+
+    async def process_message(self, message, session_id=DEFAULT_SESSION):
         """Process user message using Ollama LLM and execute tools if needed."""
+        speculative_params, speculative_task = None, None
         try:
+            # Replies to the first message of a conversation depend on nothing else
+            first_message = not self.groq_service.has_history(session_id)
+
+            # Reuse the answer to a near-duplicate question if one is cached. Messages
+            # that may need patient data always go to the tool, so they are not embedded
+            embedding = None
+            if not self.groq_service.needs_tool(message) and (
+                    first_message or self.semantic_cache.has_entries(session_id)):
+                embedding = await self.semantic_cache.embed(message)
+                cached_response = self.semantic_cache.lookup(embedding, session_id)
+                if cached_response is not None:
+                    return cached_response
+
+            # Overlap a likely patient lookup with the first LLM round-trip, unless
+            # the reply comes back without one (resubmits, no API key)
+            if self.groq_service.is_configured() and not self.groq_service.is_resubmit(message, session_id):
+                speculative_params, speculative_task = self.speculate_patient_search(message)
+
             # First, get LLM response and intent analysis
             llm_result = await self.groq_service.generate_response(
                 message,
-                context={'available_tools': list(self.available_tools.keys())}
+                context={'available_tools': list(self.available_tools.keys())},
+                session_id=session_id
             )
 
             # Check if setup is required
@@ -100,35 +225,63 @@ class ChatbotMCPIntegration:
             if llm_result.get('requires_tool') and llm_result.get('intent') == 'patient_search':
                 tool_params = llm_result.get('tool_params', {})
 
-                # Execute patient search tool
-                tool_result = await self.get_patient_list(
-                    patient_name=tool_params.get('patient_name'),
-                    limit=tool_params.get('limit', 10)
-                )
-
-                # Generate final response with tool result
-                final_result = await self.groq_service.generate_response(
-                    message,
-                    context={'tool_result': tool_result}
-                )
-
-                return final_result['response']
+                # Execute patient search tool, reusing the speculative lookup if it matches
+                params = self.patient_search_params(tool_params.get('patient_name'), tool_params.get('limit'))
+                if speculative_task and params == speculative_params:
+                    tool_result = await speculative_task
+                else:
+                    tool_result = await self.get_patient_list(patient_name=params[0], limit=params[1])
+
+                # Questions about the results get a natural-language answer
+                if RESULT_QUESTION_PATTERN.search(message):
+                    final_result = await self.groq_service.generate_response(
+                        message,
+                        context={'tool_result': tool_result},
+                        session_id=session_id
+                    )
+                    return final_result['response']
+
+                # Plain lookups return the already human-readable patient list
+                self.groq_service.add_to_conversation('assistant', tool_result, session_id)
+                return tool_result
+
+            # Cache conversational answers only: patient lookups that differ just
+            # by name embed almost identically and must always hit the tool, and
+            # replies shaped by earlier messages would not fit another context
+            if first_message and 'error' not in llm_result:
+                self.semantic_cache.add(embedding, llm_result['response'], session_id)
 
             # Return LLM response directly
             return llm_result['response']
 
         except Exception as e:
             error_msg = f"An error occurred while processing your request: {str(e)}"
-            print(f"Error in process_message: {e}")
+            logger.exception("Error in process_message")
             return error_msg
+        finally:
+            # Drop the speculative lookup if the LLM did not need it
+            if speculative_task and not speculative_task.done():
+                speculative_task.cancel()
+
+    async def stream_message(self, message, session_id=DEFAULT_SESSION):
+        """Yield the reply to a message incrementally, streaming LLM tokens when no tool is needed."""
+        # Messages that may need patient data take the same tool-aware path as /api/chat;
+        # the tool returns the whole listing at once
+        if self.groq_service.needs_tool(message):
+            yield await self.process_message(message, session_id)
+            return
+
+        async for text in self.groq_service.stream_response(message, session_id=session_id):
+            yield text
 
-    def clear_conversation(self):
-        """Clear conversation history."""
-        self.groq_service.clear_conversation()
+    def clear_conversation(self, session_id=DEFAULT_SESSION):
+        """Clear conversation history and the session's cached answers."""
+        self.groq_service.clear_conversation(session_id)
+        self.semantic_cache.clear(session_id)
 
-    def get_conversation_summary(self):
+    def get_conversation_summary(self, session_id=DEFAULT_SESSION):
         """Get conversation summary."""
-        return self.groq_service.get_conversation_summary()
+        return self.groq_service.get_conversation_summary(session_id)
 
     def is_llm_configured(self):
         """Check if LLM service is properly configured."""
@@ -139,25 +292,48 @@ class ChatbotMCPIntegration:
 # Initialize MCP integration
 mcp_integration = ChatbotMCPIntegration()
 
+@atexit.register
+def close_api_client():
+    """Release pooled patient API and Groq connections on shutdown."""
+    if MCP_AVAILABLE:
+        run_async(patient_api_client.aclose(), timeout=5)
+    run_async(mcp_integration.groq_service.aclose(), timeout=5)
+
+def chat_session_id():
+    """Identify the conversation of the current browser session, starting one if needed."""
+    if 'chat_id' not in session:
+        session['chat_id'] = uuid.uuid4().hex
+    return session['chat_id']
+
 @app.route('/')
 def index():
     """Render the main chat interface."""
+    chat_session_id()
     return render_template('index.html')
 
 @app.route('/teams')
 def teams_index():
     """Render Teams-optimized chat interface."""
+    chat_session_id()
     return render_template('teams.html')
 
-@app.route('/teams/config')
-def teams_config():
-    """Teams app configuration page."""
-    return render_template('teams_config.html')
+def static_page(html):
+    """Pre-encode a static HTML page and compute its ETag once."""
+    body = html.encode('utf-8')
+    return body, hashlib.sha1(body).hexdigest()
 
-@app.route('/privacy')
-def privacy():
-    """Privacy policy page for Teams app."""
-    return """
+def serve_static_page(page):
+    """Serve a pre-encoded page, answering 304 when the client's copy is current."""
+    body, etag = page
+    response = Response(body, mimetype='text/html; charset=utf-8')
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+with open(os.path.join(app.root_path, app.template_folder, 'teams_config.html'), encoding='utf-8') as f:
+    TEAMS_CONFIG_PAGE = static_page(f.read())
+
+PRIVACY_PAGE = static_page("""
     <html>
     <head><title>Privacy Policy - Healthcare Assistant</title></head>
     <body style="font-family: Arial, sans-serif; max-width: 800px; margin: 0 auto; padding: 20px;">
@@ -176,12 +352,9 @@ def privacy():
         <p>Last updated: January 2024</p>
     </body>
     </html>
-    """
+""")
 
-@app.route('/terms')
-def terms():
-    """Terms of use page for Teams app."""
-    return """
+TERMS_PAGE = static_page("""
     <html>
     <head><title>Terms of Use - Healthcare Assistant</title></head>
     <body style="font-family: Arial, sans-serif; max-width: 800px; margin: 0 auto; padding: 20px;">
@@ -200,7 +373,22 @@ def terms():
         <p>Last updated: January 2024</p>
     </body>
     </html>
-    """
+""")
+
+@app.route('/teams/config')
+def teams_config():
+    """Teams app configuration page."""
+    return serve_static_page(TEAMS_CONFIG_PAGE)
+
+@app.route('/privacy')
+def privacy():
+    """Privacy policy page for Teams app."""
+    return serve_static_page(PRIVACY_PAGE)
+
+@app.route('/terms')
+def terms():
+    """Terms of use page for Teams app."""
+    return serve_static_page(TERMS_PAGE)
 
 @app.route('/api/chat', methods=['POST'])
 def chat_api():
@@ -210,56 +398,96 @@ def chat_api():
         message = data.get('message', '').strip()
         
         if not message:
-            return jsonify({'error': 'Message cannot be empty'}), 400
+            return json_response({'error': 'Message cannot be empty'}, 400)
         
-        # Process message asynchronously
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        response = loop.run_until_complete(mcp_integration.process_message(message))
-        loop.close()
+        # Process message on the shared event loop
+        response = run_async(mcp_integration.process_message(message, chat_session_id()))
         
-        return jsonify({
+        return json_response({
             'response': response,
             'status': 'success'
         })
     
+    except TimeoutError as e:
+        return json_response({'error': str(e), 'status': 'error'}, 504)
     except Exception as e:
-        return jsonify({
+        return json_response({
             'error': f'Server error: {str(e)}',
             'status': 'error'
-        }), 500
+        }, 500)
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream_api():
+    """REST API endpoint streaming the reply to a chat message as Server-Sent Events."""
+    data = request.get_json(silent=True) or {}
+    message = data.get('message', '').strip()
+    
+    if not message:
+        return json_response({'error': 'Message cannot be empty'}, 400)
+    
+    session_id = chat_session_id()
+    
+    def events():
+        # The generator lives on the shared event loop; pull one chunk at a time from it
+        stream = mcp_integration.stream_message(message, session_id)
+        try:
+            while (text := run_async(next_chunk(stream))) is not None:
+                yield sse_event({'text': text})
+            yield sse_event({'done': True, 'status': 'success'})
+        except Exception as e:
+            yield sse_event({'error': f'Server error: {str(e)}', 'status': 'error'})
+        finally:
+            run_async(stream.aclose(), timeout=5)
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
+async def clear_chat_session(session_id):
+    """Clear a conversation's history and cached answers, and the cached patient data."""
+    mcp_integration.clear_conversation(session_id)
+    if MCP_AVAILABLE:
+        patient_api_client.clear_cache()  # Force fresh patient data
 
 @app.route('/api/clear-chat', methods=['POST'])
 def clear_chat():
     """Clear conversation history."""
     try:
-        mcp_integration.clear_conversation()
-        return jsonify({
+        # Histories and caches are owned by the background loop, so clear them from
+        # there, and only answer once they are gone
+        run_async(clear_chat_session(chat_session_id()), timeout=5)
+        return json_response({
             'message': 'Conversation history cleared',
             'status': 'success'
         })
     except Exception as e:
-        return jsonify({
+        return json_response({
             'error': f'Error clearing chat: {str(e)}',
             'status': 'error'
-        }), 500
+        }, 500)
+
+# Serialized /api/status bodies keyed by (llm_configured, model); only those two fields vary
+STATUS_BODIES = {}
 
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """Get system status including LLM configuration."""
     try:
-        return jsonify({
-            'mcp_available': MCP_AVAILABLE,
-            'llm_configured': mcp_integration.is_llm_configured(),
-            'llm_service': 'Groq',
-            'model': mcp_integration.groq_service.model_name,
-            'status': 'success'
-        })
+        key = (mcp_integration.is_llm_configured(), mcp_integration.groq_service.model_name)
+        body = STATUS_BODIES.get(key)
+        if body is None:
+            body = STATUS_BODIES[key] = orjson.dumps({
+                'mcp_available': MCP_AVAILABLE,
+                'llm_configured': key[0],
+                'llm_service': 'Groq',
+                'model': key[1],
+                'status': 'success'
+            })
+        return Response(body, mimetype='application/json')
     except Exception as e:
-        return jsonify({
+        return json_response({
             'error': f'Error getting status: {str(e)}',
             'status': 'error'
-        }), 500
+        }, 500)
 
 @socketio.on('connect')
 def handle_connect():
@@ -269,7 +497,22 @@ def handle_connect():
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection."""
-    print('Client disconnected')
+    logger.info('Client disconnected')
+
+def emit_chat_response(future, message, sid):
+    """Send the result of a processed chat message back to the client that sent it."""
+    try:
+        payload = {
+            'response': future.result(),
+            'original_message': message,
+            'status': 'success'
+        }
+    except Exception as e:
+        payload = {
+            'error': f'Server error: {str(e)}',
+            'status': 'error'
+        }
+    socketio.emit('chat_response', payload, to=sid)
 
 @socketio.on('chat_message')
 def handle_chat_message(data):
@@ -281,17 +524,13 @@ def handle_chat_message(data):
             emit('chat_response', {'error': 'Message cannot be empty'})
             return
         
-        # Process message asynchronously
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        response = loop.run_until_complete(mcp_integration.process_message(message))
-        loop.close()
-        
-        emit('chat_response', {
-            'response': response,
-            'original_message': message,
-            'status': 'success'
-        })
+        # Process message on the shared event loop and reply when it completes,
+        # without holding this handler's thread for the whole LLM round-trip
+        sid = request.sid
+        future = asyncio.run_coroutine_threadsafe(
+            mcp_integration.process_message(message, chat_session_id()), _loop
+        )
+        future.add_done_callback(lambda f: emit_chat_response(f, message, sid))
     
     except Exception as e:
         emit('chat_response', {
@@ -299,6 +538,17 @@ def handle_chat_message(data):
             'status': 'error'
         })
 
+@socketio.on('clear_chat')
+def handle_clear_chat():
+    """Clear the conversation of this connection's chat messages, acknowledging when done."""
+    # Socket.IO chats are keyed by the connection's session, which differs from the
+    # cookie session /api/clear-chat sees when the browser blocks cookies (Teams iframe)
+    try:
+        run_async(clear_chat_session(chat_session_id()), timeout=5)
+        return {'message': 'Conversation history cleared', 'status': 'success'}
+    except Exception as e:
+        return {'error': f'Error clearing chat: {str(e)}', 'status': 'error'}
+
 if __name__ == '__main__':
     print("🏥 Starting Healthcare Chatbot with Groq LLM...")
     print(f"📁 Working directory: {os.getcwd()}")
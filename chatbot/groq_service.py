@@ -5,42 +5,49 @@ Handles communication with Groq API for fast natural language processing
 """
 
 import os
-from groq import Groq
-import json
-import asyncio
-from typing import Dict, List, Optional, Any
-from datetime import datetime
+import re
+import time
+import logging
+import httpx
+from cachetools import LRUCache
+from groq import AsyncGroq
+import orjson
+from typing import Dict, List, Optional, Any, AsyncIterator, Final, ClassVar, Tuple
+from collections import deque
+from types import MappingProxyType
+from itertools import islice
+from functools import lru_cache
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=None)
+def _encoding():
+    """Load the tokenizer on first use; it may have to be downloaded."""
+    try:
+        import tiktoken
+        # Groq's models use their own tokenizers; cl100k_base is a close enough estimate
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Optional dependency: pip install tiktoken (falls back to ~4 characters per token)
+        logger.warning("tiktoken unavailable, estimating tokens from characters")
+        return None
 
-class GroqService:
-    """Service class for integrating with Groq LLM."""
-    
-    def __init__(self, model_name: str = "llama3-8b-8192", api_key: Optional[str] = None):
-        """
-        Initialize Groq service.
-        
-        Args:
-            model_name: Name of the Groq model to use (default: llama3-8b-8192)
-            api_key: Groq API key (if not provided, will look for GROQ_API_KEY env var)
-        """
-        self.model_name = model_name
-        self.api_key = api_key or os.getenv("GROQ_API_KEY")
-        
-        if not self.api_key:
-            print("⚠️  Warning: No Groq API key found. Please set GROQ_API_KEY environment variable.")
-            print("   You can get a free API key from: https://console.groq.com/")
-        
-        self.client = Groq(api_key=self.api_key) if self.api_key else None
-        self.conversation_history = []
-        self.system_prompt = self._get_system_prompt()
-        
-    def _get_system_prompt(self) -> str:
-        """Get the system prompt for the healthcare chatbot."""
-        return """You are a helpful healthcare chatbot assistant. Your primary function is to help users find and filter patient information.
+
+def count_tokens(text: str) -> int:
+    """Estimate the number of tokens in a piece of text."""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return len(text) // 4 + 1
+
+# System prompt for the healthcare chatbot. It is sent as the first message of every
+# request and must stay byte-identical so Groq can reuse its cached prefill; dynamic
+# context belongs in the user message
+SYSTEM_PROMPT: Final[str] = """You are a helpful healthcare chatbot assistant. Your primary function is to help users find and filter patient information.
 
 AVAILABLE TOOLS:
 - getpatientlist: Get a list of patients filtered by patient name and limit
@@ -78,159 +85,465 @@ RESPONSE FORMAT:
 - Use a friendly, professional tone suitable for healthcare settings
 
 Remember: You can only access patient data through the getpatientlist tool. Do not make up or hallucinate patient information."""
+SYSTEM_MESSAGE: Final[Dict[str, str]] = {'role': 'system', 'content': SYSTEM_PROMPT}
+
+
+@lru_cache(maxsize=None)
+def _system_prompt_tokens() -> int:
+    """Token count of the system prompt, computed on first use."""
+    return count_tokens(SYSTEM_PROMPT)
+
+
+# Tokens reserved for the reply, and headroom for message framing and tool schemas
+MAX_COMPLETION_TOKENS = 500
+PROMPT_TOKEN_MARGIN = 256
 
-    def add_to_conversation(self, role: str, content: str):
-        """Add a message to conversation history."""
-        self.conversation_history.append({
-            'role': role,
-            'content': content,
-            'timestamp': datetime.now().isoformat()
-        })
+# Context window of each model, in tokens
+CONTEXT_WINDOWS = {
+    "llama3-8b-8192": 8192,
+    "llama3-70b-4096": 4096,
+    "mixtral-8x7b-32768": 32768,
+    "gemma-7b-it": 8192,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Results that never change, shared instead of rebuilt on every call
+UNCONFIGURED_RESULT: Final = MappingProxyType({
+    'response': "❌ Sorry, I'm not properly configured. Please set up the Groq API key.",
+    'intent': 'error',
+    'confidence': 0.0,
+    'requires_tool': False,
+    'setup_required': True
+})
+AUTH_ERROR_RESULT: Final = MappingProxyType({
+    'response': "❌ API authentication failed. Please check your Groq API key configuration.",
+    'intent': 'error',
+    'confidence': 0.0,
+    'requires_tool': False,
+    'setup_required': True
+})
+TECHNICAL_ERROR_RESULT: Final = MappingProxyType({
+    'response': "❌ I'm experiencing technical difficulties. Please try again or contact support if the problem persists.",
+    'intent': 'error',
+    'confidence': 0.0,
+    'requires_tool': False
+})
+
+# Conversation used when the caller does not identify one
+DEFAULT_SESSION = "default"
+# Seconds within which an identical message is treated as an accidental resubmit
+DUPLICATE_WINDOW = 5.0
+
+# Tools offered to the model through function calling
+PATIENT_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "getpatientlist",
+            "description": "Get a list of patients filtered by patient name",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "patient_name": {
+                        "type": "string",
+                        "description": "Filter by patient name (optional, partial matches supported)"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of patients to return (1-100, default: 10)"
+                    }
+                },
+                "required": []
+            }
+        }
+    }
+]
+
+# Keyword groups used to classify a message's intent in a single regex pass
+INTENT_PATTERN = re.compile(
+    r"\b(?:(?P<patient>patients?|find|search|list|show|get)"
+    r"|(?P<medical>diagnosis|medications?|allerg(?:y|ies)|condition|treatment|medicine)"
+    r"|(?P<name>named|called|name)"
+    r"|(?P<help>help|what|how|commands?))\b",
+    re.IGNORECASE
+)
+NAME_PATTERN = re.compile(r"\b(?:named|called|name)\s+(\S+)", re.IGNORECASE)
+NAME_STOPWORDS = frozenset({'is', 'are', 'the', 'a', 'an'})
+LIMIT_PATTERN = re.compile(r"(\d+)\s*patient", re.IGNORECASE)
+# Unambiguous patient searches, e.g. "find patients named John" or "show me 5 patients".
+# Only these earn the confidence needed to call the tool without asking the LLM
+STRICT_NAME_PATTERN = re.compile(r"\bpatients?\b.*?\b(?:named|called)\s+([a-z][\w'-]*)", re.IGNORECASE)
+STRICT_LIMIT_PATTERN = re.compile(r"^\s*(?:show|list|find|get)\b.*?\b(\d+)\s+patients?\b", re.IGNORECASE)
+FAST_PATH_CONFIDENCE = 0.9
+# Bare requests for help, answered without calling the LLM
+HELP_ONLY_PATTERN = re.compile(r"^\s*(?:help|commands?|what can you do)\s*[?!.]*\s*$", re.IGNORECASE)
+
+HELP_RESPONSE: Final[str] = (
+    "I can help you find patient information. Try asking:\n"
+    "- \"Show me all patients\"\n"
+    "- \"Find patients named John\"\n"
+    "- \"Show me 5 patients\"\n"
+    "- \"What medications does the patient named Mary take?\""
+)
+
+
+class GroqService:
+    """Service class for integrating with Groq LLM."""
+    
+    AVAILABLE_MODELS: ClassVar[Tuple[str, ...]] = (
+        "llama3-8b-8192",      # Fast, good for most tasks
+        "llama3-70b-4096",     # More capable, slower
+        "mixtral-8x7b-32768",  # Good balance of speed and capability
+        "gemma-7b-it"          # Alternative model
+    )
+    
+    def __init__(self, model_name: str = "llama3-8b-8192", api_key: Optional[str] = None):
+        """
+        Initialize Groq service.
+        
+        Args:
+            model_name: Name of the Groq model to use (default: llama3-8b-8192)
+            api_key: Groq API key (if not provided, will look for GROQ_API_KEY env var)
+        """
+        self.model_name = model_name
+        self.api_key = api_key or os.getenv("GROQ_API_KEY")
+        
+        if not self.api_key:
+            logger.warning("No Groq API key found. Please set GROQ_API_KEY environment variable. "
+                           "You can get a free API key from: https://console.groq.com/")
+        
+        self.client = AsyncGroq(
+            api_key=self.api_key,
+            max_retries=2,
+            timeout=30.0,
+            http_client=self._build_http_client()
+        ) if self.api_key else None
+        self._configured = self.client is not None and self.api_key is not None
+        if not self._configured:
+            # Without a client every request gets the same setup message, so skip the checks
+            self.generate_response = self._unconfigured_response
+            self.stream_response = self._unconfigured_stream
+        # Per-session conversation histories, least recently used sessions are dropped.
+        # Each keeps its last 10 (role, content, tokens) entries
+        self._histories = LRUCache(maxsize=1024)
+        # Last LLM-generated reply of each session, as (message, result, monotonic time)
+        self._last_replies = LRUCache(maxsize=1024)
+        self.system_prompt = SYSTEM_PROMPT
+        self._system_msg = SYSTEM_MESSAGE
+        
+    def _build_http_client(self) -> httpx.AsyncClient:
+        """Build the pooled HTTP client shared by all Groq requests."""
+        # Concurrent requests multiplex over one kept-alive HTTP/2 connection
+        # instead of each paying for a new TCP and TLS handshake
+        return httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0)
+        )
         
-        # Keep only last 10 messages to manage context length
-        if len(self.conversation_history) > 10:
-            self.conversation_history = self.conversation_history[-10:]
+    def _history(self, session_id: str) -> deque:
+        """Get the conversation history of a session, creating it on first use."""
+        history = self._histories.get(session_id)
+        if history is None:
+            history = self._histories[session_id] = deque(maxlen=10)
+        return history
 
-    def _prepare_messages(self, user_message: str) -> List[Dict[str, str]]:
+    def has_history(self, session_id: str = DEFAULT_SESSION) -> bool:
+        """Check whether a session has any conversation history yet."""
+        return bool(self._histories.get(session_id))
+
+    def add_to_conversation(self, role: str, content: str, session_id: str = DEFAULT_SESSION):
+        """Add a message to a session's conversation history."""
+        if role == 'user':
+            # A new turn supersedes the reply a resubmit could have reused
+            self._last_replies.pop(session_id, None)
+        self._history(session_id).append((role, content, count_tokens(content)))
+
+    def _prepare_messages(self, user_message: str, session_id: str = DEFAULT_SESSION) -> List[Dict[str, str]]:
         """Prepare messages for Groq API call."""
-        messages = [{'role': 'system', 'content': self.system_prompt}]
-        
-        # Add conversation history
-        for msg in self.conversation_history[-6:]:  # Last 6 messages for context
-            if msg['role'] in ['user', 'assistant']:
-                messages.append({
-                    'role': msg['role'],
-                    'content': msg['content']
-                })
+        # Token budget left for history once the system prompt, the current
+        # message and the reply are accounted for
+        budget = (CONTEXT_WINDOWS.get(self.model_name, DEFAULT_CONTEXT_WINDOW)
+                  - _system_prompt_tokens() - count_tokens(user_message)
+                  - MAX_COMPLETION_TOKENS - PROMPT_TOKEN_MARGIN)
         
-        # Add current user message
-        messages.append({'role': 'user', 'content': user_message})
+        # Walk back through the last 6 messages, keeping as many as fit the budget
+        history = []
+        for role, content, tokens in islice(reversed(self._history(session_id)), 6):
+            budget -= tokens
+            if budget < 0:
+                break
+            history.append({'role': role, 'content': content})
+        history.reverse()
         
-        return messages
+        return [self._system_msg, *history, {'role': 'user', 'content': user_message}]
 
-    async def generate_response(self, user_message: str, context: Optional[Dict] = None) -> Dict[str, Any]:
+    def _enhance_message(self, user_message: str, context: Optional[Dict] = None) -> str:
+        """Add context information to the user message if provided."""
+        if context:
+            if context.get('tool_result'):
+                tool_result = context['tool_result']
+                if not isinstance(tool_result, str):
+                    tool_result = orjson.dumps(tool_result).decode()
+                return f"User query: {user_message}\n\nTool result: {tool_result}\n\nPlease provide a helpful, friendly response based on this information. Format the patient data nicely if applicable."
+            elif context.get('available_tools'):
+                return f"{user_message}\n\nAvailable tools: {', '.join(context['available_tools'])}"
+        return user_message
+
+    async def generate_response(self, user_message: str, context: Optional[Dict] = None,
+                                session_id: str = DEFAULT_SESSION) -> Dict[str, Any]:
         """
         Generate a response using Groq LLM.
         
         Args:
             user_message: User's input message
             context: Optional context information (e.g., available tools, previous results)
+            session_id: Conversation the message belongs to
             
         Returns:
             Dictionary containing response and metadata
         """
         try:
-            if not self.client:
+            # Nothing to ask the LLM about
+            if not user_message.strip():
                 return {
-                    'response': "❌ Sorry, I'm not properly configured. Please set up the Groq API key.",
-                    'intent': 'error',
-                    'confidence': 0.0,
+                    'response': "Could you tell me what patient information you're looking for?",
+                    'intent': 'general',
+                    'confidence': 1.0,
                     'requires_tool': False,
-                    'setup_required': True
+                    'tool_params': {},
+                    'model_used': None
                 }
             
-            # Add context to user message if provided
-            enhanced_message = user_message
-            if context:
-                if context.get('tool_result'):
-                    enhanced_message = f"User query: {user_message}\n\nTool result: {context['tool_result']}\n\nPlease provide a helpful, friendly response based on this information. Format the patient data nicely if applicable."
-                elif context.get('available_tools'):
-                    enhanced_message = f"{user_message}\n\nAvailable tools: {', '.join(context['available_tools'])}"
+            # Answer obvious requests without a Groq round-trip
+            if not (context and context.get('tool_result')):
+                fast_result = self._fast_path(user_message, context, session_id)
+                if fast_result is not None:
+                    return fast_result
             
             # Prepare messages
-            messages = self._prepare_messages(enhanced_message)
+            messages = self._prepare_messages(self._enhance_message(user_message, context), session_id)
+            
+            # Offer tools through function calling so one request can either
+            # answer directly or ask for a tool call
+            tool_kwargs = {}
+            if context and context.get('available_tools'):
+                tool_kwargs = {
+                    'tools': [t for t in PATIENT_TOOLS if t['function']['name'] in context['available_tools']],
+                    'tool_choice': 'auto'
+                }
             
             # Generate response using Groq
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
+            response = await self.client.chat.completions.create(
                 model=self.model_name,
                 messages=messages,
                 temperature=0.7,
-                max_tokens=500,
+                max_tokens=MAX_COMPLETION_TOKENS,
                 top_p=0.9,
-                stream=False
+                stream=False,
+                **tool_kwargs
             )
             
-            assistant_response = response.choices[0].message.content
+            message = response.choices[0].message
+            assistant_response = message.content or ""
+            tool_calls = message.tool_calls or []
             
-            # Add to conversation history
-            self.add_to_conversation('user', user_message)
-            self.add_to_conversation('assistant', assistant_response)
+            # Add to conversation history; the reply to a tool call is added by the caller
+            self.add_to_conversation('user', user_message, session_id)
+            if not tool_calls:
+                self.add_to_conversation('assistant', assistant_response, session_id)
             
-            # Analyze intent and determine if tool is needed
-            intent_analysis = await self._analyze_intent(user_message, assistant_response)
+            # Intent comes from the same call: a tool call, or a direct answer when tools
+            # were offered. Keyword analysis is only needed when no tools were offered
+            if tool_calls:
+                intent_analysis = self._tool_call_intent(tool_calls[0])
+            elif tool_kwargs:
+                intent_analysis = {'intent': 'general', 'confidence': 1.0, 'requires_tool': False, 'tool_params': {}}
+            else:
+                intent_analysis = self._analyze_intent(user_message, assistant_response)
             
-            return {
+            result = {
                 'response': assistant_response,
                 'intent': intent_analysis['intent'],
                 'confidence': intent_analysis['confidence'],
                 'requires_tool': intent_analysis['requires_tool'],
                 'tool_params': intent_analysis.get('tool_params', {}),
-                'raw_response': response,
+                'usage': {
+                    'prompt_tokens': response.usage.prompt_tokens,
+                    'completion_tokens': response.usage.completion_tokens
+                } if response.usage else None,
                 'model_used': self.model_name
             }
             
+            # Remember direct answers so an immediate resubmit can reuse them; replies
+            # built from tool output always reflect fresh data and are not reused
+            if not tool_calls and not (context and context.get('tool_result')):
+                self._last_replies[session_id] = (user_message.strip(), result, time.monotonic())
+            
+            return result
+            
         except Exception as e:
-            error_msg = f"Error generating response: {str(e)}"
-            print(error_msg)
+            logger.exception("Error generating response")
             
             # Check if it's an API key issue
-            if "api_key" in str(e).lower() or "unauthorized" in str(e).lower():
-                return {
-                    'response': "❌ API authentication failed. Please check your Groq API key configuration.",
-                    'intent': 'error',
-                    'confidence': 0.0,
-                    'requires_tool': False,
-                    'setup_required': True,
-                    'error': str(e)
-                }
+            error = str(e)
+            lowered = error.lower()
+            if "api_key" in lowered or "unauthorized" in lowered:
+                return AUTH_ERROR_RESULT | {'error': error}
+            
+            return TECHNICAL_ERROR_RESULT | {'error': error}
+
+    async def stream_response(self, user_message: str, context: Optional[Dict] = None,
+                              session_id: str = DEFAULT_SESSION) -> AsyncIterator[str]:
+        """
+        Stream a response from Groq LLM as it is generated.
+        
+        Args:
+            user_message: User's input message
+            context: Optional context information (e.g., previous tool results)
+            session_id: Conversation the message belongs to
             
+        Yields:
+            Pieces of the response text as soon as Groq produces them
+        """
+        messages = self._prepare_messages(self._enhance_message(user_message, context), session_id)
+        
+        chunks = []
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=MAX_COMPLETION_TOKENS,
+                top_p=0.9,
+                stream=True
+            )
+            async for chunk in stream:
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if content:
+                    chunks.append(content)
+                    yield content
+        except Exception:
+            logger.exception("Error streaming response")
+            yield TECHNICAL_ERROR_RESULT['response']
+            return
+        
+        # Record the exchange only once the full reply has been delivered
+        self.add_to_conversation('user', user_message, session_id)
+        self.add_to_conversation('assistant', "".join(chunks), session_id)
+
+    async def _unconfigured_response(self, user_message: str, context: Optional[Dict] = None,
+                                     session_id: str = DEFAULT_SESSION) -> Dict[str, Any]:
+        """Stand-in for generate_response when no Groq API key is configured."""
+        return dict(UNCONFIGURED_RESULT)
+
+    async def _unconfigured_stream(self, user_message: str, context: Optional[Dict] = None,
+                                   session_id: str = DEFAULT_SESSION) -> AsyncIterator[str]:
+        """Stand-in for stream_response when no Groq API key is configured."""
+        yield UNCONFIGURED_RESULT['response']
+
+    def _fast_path(self, user_message: str, context: Optional[Dict] = None,
+                   session_id: str = DEFAULT_SESSION) -> Optional[Dict[str, Any]]:
+        """Resolve a message without calling Groq when the answer is already known."""
+        # A repeat of the last message within a few seconds (e.g. a double submit)
+        # gets the same reply again
+        if self.is_resubmit(user_message, session_id):
+            return dict(self._last_replies[session_id][1])
+        
+        if HELP_ONLY_PATTERN.match(user_message):
+            self.add_to_conversation('user', user_message, session_id)
+            self.add_to_conversation('assistant', HELP_RESPONSE, session_id)
             return {
-                'response': "❌ I'm experiencing technical difficulties. Please try again or contact support if the problem persists.",
-                'intent': 'error',
-                'confidence': 0.0,
+                'response': HELP_RESPONSE,
+                'intent': 'help',
+                'confidence': 1.0,
                 'requires_tool': False,
-                'error': str(e)
+                'tool_params': {},
+                'model_used': None
             }
+        
+        # Patient searches with explicit parameters go straight to the tool
+        if context and context.get('available_tools'):
+            intent_analysis = self._analyze_intent(user_message, "")
+            if (intent_analysis['intent'] == 'patient_search' and intent_analysis['tool_params']
+                    and intent_analysis['confidence'] >= FAST_PATH_CONFIDENCE):
+                self.add_to_conversation('user', user_message, session_id)
+                return {
+                    'response': None,
+                    'intent': 'patient_search',
+                    'confidence': intent_analysis['confidence'],
+                    'requires_tool': True,
+                    'tool_params': intent_analysis['tool_params'],
+                    'model_used': None
+                }
+        
+        return None
 
-    async def _analyze_intent(self, user_message: str, assistant_response: str) -> Dict[str, Any]:
-        """Analyze user intent to determine if tools are needed."""
-        user_lower = user_message.lower()
+    def _tool_call_intent(self, tool_call) -> Dict[str, Any]:
+        """Convert a function call requested by the model into intent analysis."""
+        try:
+            tool_params = orjson.loads(tool_call.function.arguments or "{}")
+        except ValueError:
+            tool_params = {}
+        # The model may send "null", a list or a bare value instead of an object
+        if not isinstance(tool_params, dict):
+            tool_params = {}
         
-        # Check for patient-related queries
-        patient_keywords = ['patient', 'patients', 'find', 'search', 'list', 'show', 'get']
-        name_keywords = ['named', 'called', 'name', 'with name']
-        medical_keywords = ['diagnosis', 'medication', 'allergy', 'allergies', 'condition', 'treatment', 'medicine']
+        return {
+            'intent': 'patient_search' if tool_call.function.name == 'getpatientlist' else 'general',
+            'confidence': 1.0,
+            'requires_tool': True,
+            'tool_params': {k: v for k, v in tool_params.items() if v not in (None, "")}
+        }
+
+    def is_resubmit(self, user_message: str, session_id: str = DEFAULT_SESSION) -> bool:
+        """Check whether a message repeats the session's last one within DUPLICATE_WINDOW."""
+        last = self._last_replies.get(session_id)
+        return (last is not None and last[0] == user_message.strip()
+                and time.monotonic() - last[2] <= DUPLICATE_WINDOW)
+
+    def needs_tool(self, user_message: str) -> bool:
+        """Check whether a message may need patient data from a tool to be answered."""
+        return self._analyze_intent(user_message, "")['requires_tool']
+
+    def _analyze_intent(self, user_message: str, assistant_response: str) -> Dict[str, Any]:
+        """Analyze user intent to determine if tools are needed."""
+        # One pass over the message collects every keyword group that occurs
+        groups = {match.lastgroup for match in INTENT_PATTERN.finditer(user_message)}
         
         requires_tool = False
         tool_params = {}
         intent = 'general'
         confidence = 0.5
         
-        if any(keyword in user_lower for keyword in patient_keywords) or any(keyword in user_lower for keyword in medical_keywords):
+        if 'patient' in groups or 'medical' in groups:
             intent = 'patient_search'
             requires_tool = True
             confidence = 0.8
             
-            # Extract patient name if mentioned
-            if any(keyword in user_lower for keyword in name_keywords):
-                # Simple name extraction
-                words = user_message.split()
-                for i, word in enumerate(words):
-                    if word.lower() in name_keywords and i + 1 < len(words):
-                        # Get the next word as potential name
-                        potential_name = words[i + 1].strip('.,!?')
-                        if potential_name and not potential_name.lower() in ['is', 'are', 'the', 'a', 'an']:
-                            tool_params['patient_name'] = potential_name
-                        break
+            # Extract patient name if mentioned: the word after the first name keyword
+            if 'name' in groups:
+                name_match = NAME_PATTERN.search(user_message)
+                if name_match:
+                    potential_name = name_match.group(1).strip('.,!?')
+                    if potential_name and potential_name.lower() not in NAME_STOPWORDS:
+                        tool_params['patient_name'] = potential_name
             
             # Extract limit if mentioned
-            import re
-            limit_match = re.search(r'(\d+)\s*patient', user_lower)
+            limit_match = LIMIT_PATTERN.search(user_message)
             if limit_match:
                 tool_params['limit'] = int(limit_match.group(1))
+            
+            # Phrasings that leave no doubt about the search are trusted as-is
+            strict_name = STRICT_NAME_PATTERN.search(user_message)
+            strict_limit = STRICT_LIMIT_PATTERN.search(user_message)
+            if strict_name and strict_name.group(1).lower() not in NAME_STOPWORDS:
+                tool_params['patient_name'] = strict_name.group(1)
+                confidence = FAST_PATH_CONFIDENCE
+            elif strict_limit and 'name' not in groups:
+                confidence = FAST_PATH_CONFIDENCE
         
-        elif any(keyword in user_lower for keyword in ['help', 'what', 'how', 'command']):
+        elif 'help' in groups:
             intent = 'help'
             confidence = 0.9
         
@@ -241,40 +554,43 @@ Remember: You can only access patient data through the getpatientlist tool. Do n
             'tool_params': tool_params
         }
 
-    def clear_conversation(self):
-        """Clear conversation history."""
-        self.conversation_history = []
+    def clear_conversation(self, session_id: str = DEFAULT_SESSION):
+        """Clear a session's conversation history."""
+        self._histories.pop(session_id, None)
+        self._last_replies.pop(session_id, None)
 
-    def get_conversation_summary(self) -> str:
-        """Get a summary of the current conversation."""
-        if not self.conversation_history:
+    def get_conversation_summary(self, session_id: str = DEFAULT_SESSION) -> str:
+        """Get a summary of a session's conversation."""
+        history = self._histories.get(session_id)
+        if not history:
             return "No conversation history."
         
-        summary = f"Conversation with {len(self.conversation_history)} messages:\n"
-        for msg in self.conversation_history[-3:]:  # Last 3 messages
-            role = msg['role'].title()
-            content = msg['content'][:100] + "..." if len(msg['content']) > 100 else msg['content']
+        summary = f"Conversation with {len(history)} messages:\n"
+        for role, content, _ in islice(history, max(len(history) - 3, 0), None):  # Last 3 messages
+            role = role.title()
+            content = content[:100] + "..." if len(content) > 100 else content
             summary += f"- {role}: {content}\n"
         
         return summary
 
     def get_available_models(self) -> List[str]:
         """Get list of available Groq models."""
-        return [
-            "llama3-8b-8192",      # Fast, good for most tasks
-            "llama3-70b-4096",     # More capable, slower
-            "mixtral-8x7b-32768",  # Good balance of speed and capability
-            "gemma-7b-it"          # Alternative model
-        ]
+        return list(self.AVAILABLE_MODELS)
 
     def set_model(self, model_name: str):
         """Change the model being used."""
-        if model_name in self.get_available_models():
+        if model_name in self.AVAILABLE_MODELS:
             self.model_name = model_name
-            print(f"✅ Model changed to: {model_name}")
+            logger.info("Model changed to: %s", model_name)
         else:
-            print(f"❌ Model {model_name} not available. Available models: {', '.join(self.get_available_models())}")
+            logger.warning("Model %s not available. Available models: %s",
+                           model_name, ', '.join(self.AVAILABLE_MODELS))
+
+    async def aclose(self):
+        """Close the pooled HTTP client used for Groq requests."""
+        if self.client:
+            await self.client.close()
 
     def is_configured(self) -> bool:
         """Check if the service is properly configured."""
-        return self.client is not None and self.api_key is not None
+        return self._configured
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Semantic Response Cache
+Reuses chatbot responses for near-duplicate questions using sentence embeddings
+"""
+
+import asyncio
+from collections import OrderedDict
+from typing import Optional, Any
+
+try:
+    import numpy as np
+    from fastembed import TextEmbedding
+    SEMANTIC_CACHE_AVAILABLE = True
+except ImportError:
+    # Optional dependency: pip install fastembed
+    SEMANTIC_CACHE_AVAILABLE = False
+
+
+class _SessionEntries:
+    """Cached (embedding, response) pairs of one conversation."""
+
+    def __init__(self):
+        self.entries = OrderedDict()  # Entry id -> (embedding, response)
+        self.next_id = 0
+        # Stacked embeddings of all entries, rebuilt lazily after changes
+        self.ids = []
+        self.matrix = None
+
+
+class SemanticCache:
+    """LRU cache of (embedding, response) pairs matched by cosine similarity, kept per session."""
+
+    def __init__(self, model_name: str = "BAAI/bge-small-en-v1.5", threshold: float = 0.93,
+                 max_entries: int = 1, max_sessions: int = 1024):
+        """
+        Initialize the semantic cache.
+
+        Args:
+            model_name: fastembed model used to embed user messages (runs locally on CPU)
+            threshold: Minimum cosine similarity for a cached response to be reused
+            max_entries: Maximum number of cached responses per session before LRU eviction
+            max_sessions: Maximum number of sessions with cached responses before LRU eviction
+        """
+        self.model_name = model_name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_sessions = max_sessions
+        self._model = None
+        # Session id -> _SessionEntries; replies never cross sessions
+        self._sessions = OrderedDict()
+
+    def is_enabled(self) -> bool:
+        """Check if the embedding backend is installed."""
+        return SEMANTIC_CACHE_AVAILABLE
+
+    def _embed(self, text: str) -> Any:
+        """Embed text into a unit-length vector, loading the model on first use."""
+        if self._model is None:
+            self._model = TextEmbedding(self.model_name)
+        vector = next(iter(self._model.embed([text])))
+        return vector / np.linalg.norm(vector)
+
+    async def embed(self, text: str) -> Optional[Any]:
+        """Embed a user message off the event loop, or return None if disabled."""
+        if not SEMANTIC_CACHE_AVAILABLE:
+            return None
+        return await asyncio.to_thread(self._embed, text.strip().lower())
+
+    def has_entries(self, session_id: str) -> bool:
+        """Check whether a session has any cached responses."""
+        session = self._sessions.get(session_id)
+        return session is not None and bool(session.entries)
+
+    def lookup(self, embedding: Optional[Any], session_id: str) -> Optional[str]:
+        """Return the session's cached response most similar to the embedding, if close enough."""
+        session = self._sessions.get(session_id)
+        if embedding is None or session is None or not session.entries:
+            return None
+        self._sessions.move_to_end(session_id)
+
+        if session.matrix is None:
+            session.ids = list(session.entries)
+            session.matrix = np.stack([session.entries[i][0] for i in session.ids])
+
+        # One matrix-vector product scores every cached entry
+        similarities = session.matrix @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+
+        entry_id = session.ids[best]
+        session.entries.move_to_end(entry_id)
+        return session.entries[entry_id][1]
+
+    def add(self, embedding: Optional[Any], response: str, session_id: str):
+        """Cache a response under the embedding of the message that produced it."""
+        if embedding is None:
+            return
+
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _SessionEntries()
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session_id)
+
+        session.entries[session.next_id] = (embedding, response)
+        session.next_id += 1
+        if len(session.entries) > self.max_entries:
+            session.entries.popitem(last=False)
+        session.matrix = None
+
+    def clear(self, session_id: Optional[str] = None):
+        """Drop the cached responses of one session, or of every session."""
+        if session_id is None:
+            self._sessions.clear()
+        else:
+            self._sessions.pop(session_id, None)
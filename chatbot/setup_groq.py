@@ -27,7 +27,7 @@ def check_api_key():
         return False, None
 
 
-def setup_api_key():
+async def setup_api_key():
     """Guide user through API key setup."""
     print("\n📋 Setting up Groq API key:")
     print("1. Go to https://console.groq.com/")
@@ -37,7 +37,7 @@ def setup_api_key():
     print("5. Copy the API key")
     
     print("\n🔑 Please enter your Groq API key: ", end="")
-    api_key = input().strip()
+    api_key = (await asyncio.to_thread(input)).strip()
     
     if not api_key:
         print("❌ No API key provided")
@@ -76,6 +76,7 @@ async def test_groq_service(api_key=None):
         # Test with a simple healthcare query
         test_message = "Hello, can you help me with patient information?"
         result = await service.generate_response(test_message)
+        await service.aclose()
         
         if result and result.get('response'):
             print("✅ Groq service test successful")
@@ -118,10 +119,10 @@ async def main():
     
     if not has_key:
         print("\n🤔 Would you like to set up your Groq API key now? (y/n): ", end="")
-        response = input().lower().strip()
+        response = (await asyncio.to_thread(input)).lower().strip()
         
         if response in ['y', 'yes']:
-            api_key = setup_api_key()
+            api_key = await setup_api_key()
             if not api_key:
                 print("\n❌ Setup failed. Please try again later.")
                 sys.exit(1)
@@ -295,7 +295,20 @@ class HealthcareChatbot {
         // Clear chat UI
         this.clearChat();
 
-        // Clear conversation history on server
+        // Clear conversation history on server, over the socket when chats go through it
+        const handleResult = (data) => {
+            if (data.status === 'success') {
+                console.log('Conversation history cleared on server');
+            } else {
+                console.error('Error clearing server history:', data.error);
+            }
+        };
+
+        if (this.isConnected && this.socket) {
+            this.socket.emit('clear_chat', handleResult);
+            return;
+        }
+
         fetch('/api/clear-chat', {
             method: 'POST',
             headers: {
@@ -303,13 +316,7 @@ class HealthcareChatbot {
             }
         })
         .then(response => response.json())
-        .then(data => {
-            if (data.status === 'success') {
-                console.log('Conversation history cleared on server');
-            } else {
-                console.error('Error clearing server history:', data.error);
-            }
-        })
+        .then(handleResult)
         .catch(error => {
             console.error('Error clearing server history:', error);
         });
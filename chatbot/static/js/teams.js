@@ -130,7 +130,14 @@ class TeamsHealthcareChatbot {
         // Clear history
         this.messageHistory = [];
 
-        // Call API to clear server-side history
+        // Clear server-side history over the socket the chat messages use
+        if (this.isConnected && this.socket) {
+            this.socket.emit('clear_chat', (data) => {
+                console.log('Chat cleared:', data.message || data.error);
+            });
+            return;
+        }
+
         fetch('/api/clear-chat', { method: 'POST' })
             .then(response => response.json())
             .then(data => {
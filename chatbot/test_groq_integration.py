@@ -44,10 +44,17 @@ async def test_groq_integration():
     print("\n🔍 Testing various queries:")
     print("-" * 30)
     
-    for i, query in enumerate(test_queries, 1):
+    # Send all queries at once, each in its own session so their histories stay apart
+    results = await asyncio.gather(
+        *(groq_service.generate_response(query, session_id=f"test-{i}") for i, query in enumerate(test_queries, 1)),
+        return_exceptions=True
+    )
+    
+    for i, (query, result) in enumerate(zip(test_queries, results), 1):
         print(f"\n{i}. Query: '{query}'")
         try:
-            result = await groq_service.generate_response(query)
+            if isinstance(result, Exception):
+                raise result
             
             if result.get('response'):
                 print(f"   ✅ Response: {result['response'][:100]}...")
@@ -61,6 +68,7 @@ async def test_groq_integration():
         except Exception as e:
             print(f"   ❌ Error: {e}")
     
+    await groq_service.aclose()
     print("\n🎉 Groq integration test completed!")
     return True
 
@@ -89,6 +97,8 @@ async def test_conversation_context():
     summary = groq_service.get_conversation_summary()
     print(f"\n📝 Conversation Summary:")
     print(summary)
+    
+    await groq_service.aclose()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Test script for intent detection in the Groq service.
+Runs offline: no Groq API key or network access is needed.
+"""
+
+from types import SimpleNamespace
+from groq_service import GroqService, HELP_ONLY_PATTERN
+
+
+def tool_call(arguments, name="getpatientlist"):
+    """Build a function call shaped like the ones the Groq SDK returns."""
+    return SimpleNamespace(function=SimpleNamespace(name=name, arguments=arguments))
+
+
+def test_tool_call_arguments(service):
+    """Malformed function call arguments give empty tool parameters instead of an error."""
+    print("🧪 Testing tool call arguments")
+    for arguments in ("null", "[]", '["John"]', "5", '"John"', "true", "{not json", "", None):
+        intent = service._tool_call_intent(tool_call(arguments))
+        assert intent['tool_params'] == {}, arguments
+        assert intent['intent'] == 'patient_search' and intent['requires_tool'], arguments
+
+    intent = service._tool_call_intent(tool_call('{"patient_name": "John", "limit": 5, "extra": null}'))
+    assert intent['tool_params'] == {'patient_name': 'John', 'limit': 5}
+    print("✓ Only JSON objects become tool parameters")
+
+
+def test_help_commands(service):
+    """"command" and "commands" both count as help requests."""
+    print("🧪 Testing help keywords")
+    for message in ("command", "commands", "Commands?", "which commands are there"):
+        intent = service._analyze_intent(message, "")
+        assert intent['intent'] == 'help' and not intent['requires_tool'], message
+    for message in ("help", "commands", "Commands!", " command "):
+        assert HELP_ONLY_PATTERN.match(message), message
+    print("✓ Singular and plural help keywords are recognized")
+
+
+if __name__ == "__main__":
+    print("🏥 Healthcare Chatbot - Intent Detection Testing")
+    print("=" * 60)
+
+    service = GroqService()
+    test_tool_call_arguments(service)
+    test_help_commands(service)
+
+    print("\n🎉 All tests completed successfully!")
@@ -3,8 +3,11 @@ Configuration file for the MCP server.
 Update these settings to match your API endpoint.
 """
 
-# API Configuration
-API_CONFIG = {
+import sys
+from types import MappingProxyType
+
+# API Configuration (read-only at runtime)
+API_CONFIG = MappingProxyType({
     # Replace with your actual API endpoint URL
     "base_url": "http://localhost:5010/api",
     
@@ -22,17 +25,26 @@ API_CONFIG = {
     
     # Request settings
     "timeout": 30,  # Request timeout in seconds
-    "max_retries": 3,  # Number of retry attempts
+    "max_retries": 3,  # Number of retry attempts for failed connections
+    "http2": True,  # Use HTTP/2 when the server supports it (set False to force HTTP/1.1)
+    "ndjson": False,  # Request newline-delimited JSON and stop reading at the limit
+    "case_insensitive_names": True,  # API matches names ignoring case, so "JOHN" and "john" share results
+    
+    # Response caching for repeated patient queries
+    "cache": {
+        "maxsize": 256,  # Maximum number of cached queries
+        "ttl": 60,  # Seconds before a cached response expires
+    },
     
     # Default parameters
     "defaults": {
         "limit": 10,  # Default number of patients to return
     }
-}
+})
 
 # Field mapping for different API response formats
 # Map your API's field names to standard field names
-FIELD_MAPPING = {
+_FIELD_ALIASES = {
     "id": ["id", "patient_id", "patientId", "PatientId", "ID"],
     "name": ["name", "patient_name", "fullName", "full_name", "Name"],
     "age": ["age", "patient_age", "Age"],
@@ -44,12 +56,17 @@ FIELD_MAPPING = {
     "status": ["status", "patient_status", "state"],
     "admission_date": ["admission_date", "admissionDate", "admitted", "date_admitted"]
 }
+# Frozen as tuples of interned names, since they are compared against every record key
+FIELD_MAPPING = MappingProxyType({
+    sys.intern(field): tuple(sys.intern(alias) for alias in aliases)
+    for field, aliases in _FIELD_ALIASES.items()
+})
 
 # API query parameter mapping
 # Map tool parameters to your API's query parameter names
-QUERY_PARAM_MAPPING = {
+QUERY_PARAM_MAPPING = MappingProxyType({
     "patient_name": "name"  # Change this to match your API's parameter name for patient name filtering
-}
+})
 
 # Example API response formats that the server can handle:
 """
@@ -6,18 +6,37 @@ This is a simple Flask server that provides a /patients endpoint.
 Run this server to test your MCP server before connecting to your real API.
 
 Usage:
-    pip install flask
+    pip install flask orjson
     python example_api_server.py
 
+For load testing or production use, serve it with gunicorn's gevent workers
+instead of the single-process development server:
+    pip install gunicorn gevent
+    gunicorn -c gunicorn_conf.py example_api_server:app
+
 Then update config.py to use: "base_url": "http://localhost:5001"
 """
 
-from flask import Flask, request, jsonify
+import os
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import compress, islice
+import orjson
+from flask import Flask, Response, request
 
 app = Flask(__name__)
+# Match routes with or without a trailing slash instead of redirecting
+app.url_map.strict_slashes = False
+
+# Serializer for every response body (module-level so tests can swap it out)
+_json_dumps = orjson.dumps
+
+def json_response(payload, status=200):
+    """Serialize a payload with orjson into a JSON response."""
+    return Response(_json_dumps(payload), status=status, mimetype='application/json')
 
-# Sample patient data
-SAMPLE_PATIENTS = [
+# Sample patient data (a tuple, so responses can alias it without copying)
+SAMPLE_PATIENTS = (
     {"id": "P001", "name": "John Smith", "age": 45, "department": "cardiology", "status": "active", "admission_date": "2024-01-15"},
     {"id": "P002", "name": "Mary Johnson", "age": 32, "department": "neurology", "status": "admitted", "admission_date": "2024-01-20"},
     {"id": "P003", "name": "Robert Brown", "age": 67, "department": "orthopedics", "status": "discharged", "admission_date": "2024-01-10"},
@@ -30,7 +49,75 @@ SAMPLE_PATIENTS = [
     {"id": "P010", "name": "Jennifer Lee", "age": 47, "department": "emergency", "status": "admitted", "admission_date": "2024-01-24"},
     {"id": "P011", "name": "Christopher White", "age": 29, "department": "cardiology", "status": "outpatient", "admission_date": "2024-01-25"},
     {"id": "P012", "name": "Amanda Clark", "age": 38, "department": "neurology", "status": "discharged", "admission_date": "2024-01-16"},
-]
+)
+
+# Lowercased names computed once, in a column parallel to SAMPLE_PATIENTS, so
+# name filtering scans plain strings and only lowercases the query
+_NAMES_LOWER = tuple(p['name'].lower() for p in SAMPLE_PATIENTS)
+# Above this many patients, names are searched as one joined string instead of one by one
+NAME_SCAN_THRESHOLD = 1000
+# Patients indexed by ID for point lookups
+_PATIENTS_BY_ID = {p['id']: p for p in SAMPLE_PATIENTS}
+# Limit applied when the request does not specify one, and the largest accepted
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+# Longest accepted name filter, so a query cannot force pathological scans
+MAX_NAME_LENGTH = 128
+
+def _build_name_index(names):
+    """Join the lowercased names with newlines and record where each one starts."""
+    if len(names) < NAME_SCAN_THRESHOLD:
+        return "", ()
+    starts, offset = [], 0
+    for name in names:
+        starts.append(offset)
+        offset += len(name) + 1
+    return "\n".join(names), tuple(starts)
+
+_NAMES_JOINED, _NAME_STARTS = _build_name_index(_NAMES_LOWER)
+
+def _name_matches(query):
+    """Yield the patients whose lowercased name contains query, in order."""
+    if not _NAME_STARTS or "\n" in query:
+        yield from compress(SAMPLE_PATIENTS, (query in lower_name for lower_name in _NAMES_LOWER))
+        return
+    
+    # One str.find over the joined names, skipping to the next name after each hit
+    pos = _NAMES_JOINED.find(query)
+    while pos != -1:
+        index = bisect_right(_NAME_STARTS, pos) - 1
+        yield SAMPLE_PATIENTS[index]
+        if index + 1 == len(_NAME_STARTS):
+            return
+        pos = _NAMES_JOINED.find(query, _NAME_STARTS[index + 1])
+
+@lru_cache(maxsize=512)
+def _build_patients_response(name, limit):
+    """Filter the patients and serialize the /api/Patient response body."""
+    # Apply name filter (partial match, case insensitive)
+    if name:
+        query = name.lower()
+        matches = _name_matches(query)
+        # Apply limit, stopping the scan as soon as enough patients matched
+        filtered_patients = list(islice(matches, limit) if limit > 0 else matches)
+    elif 0 < limit < len(SAMPLE_PATIENTS):
+        filtered_patients = SAMPLE_PATIENTS[:limit]
+    else:
+        # Unfiltered requests covering every patient serialize the data as-is
+        filtered_patients = SAMPLE_PATIENTS
+    
+    response = {
+        "patients": filtered_patients,
+        "total": len(filtered_patients),
+        "filters": {
+            "name": name,
+            "limit": limit
+        }
+    }
+    return _json_dumps(response)
+
+# The unfiltered default-limit response, the most common query, serialized up front
+_DEFAULT_RESPONSE = _build_patients_response(None, DEFAULT_LIMIT)
 
 @app.route('/api/Patient', methods=['GET'])
 def get_patients():
@@ -39,60 +126,53 @@ def get_patients():
 
     Query parameters:
     - name: Filter by patient name (partial matches supported)
-    - limit: Maximum number of patients to return
+    - limit: Maximum number of patients to return (0-100, default 10)
     """
     try:
         # Get query parameters
-        name = request.args.get('name')
-        limit = request.args.get('limit', type=int, default=10)
-
-        # Start with all patients
-        filtered_patients = SAMPLE_PATIENTS.copy()
-
-        # Apply name filter (partial match, case insensitive)
-        if name:
-            filtered_patients = [p for p in filtered_patients if name.lower() in p['name'].lower()]
-        
-        # Apply limit
-        if limit > 0:
-            filtered_patients = filtered_patients[:limit]
+        name = (request.args.get('name') or '').strip() or None
+        if name and len(name) > MAX_NAME_LENGTH:
+            return json_response({"error": f"name must be at most {MAX_NAME_LENGTH} characters"}, 400)
         
-        # Return response
-        response = {
-            "patients": filtered_patients,
-            "total": len(filtered_patients),
-            "filters": {
-                "name": name,
-                "limit": limit
-            }
-        }
-        
-        return jsonify(response), 200
+        raw_limit = request.args.get('limit')
+        try:
+            limit = int(raw_limit) if raw_limit is not None else DEFAULT_LIMIT
+        except ValueError:
+            return json_response({"error": "limit must be an integer"}, 400)
+        # Negative limits fall back to 0 (no limit); larger ones are capped
+        limit = max(0, min(limit, MAX_LIMIT))
+
+        # Repeated queries reuse the serialized response
+        if name is None and limit == DEFAULT_LIMIT:
+            body = _DEFAULT_RESPONSE
+        else:
+            body = _build_patients_response(name, limit)
+        return Response(body, status=200, mimetype='application/json')
         
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}, 500)
 
 @app.route('/patients/<patient_id>', methods=['GET'])
 def get_patient(patient_id):
     """Get a specific patient by ID."""
     try:
-        patient = next((p for p in SAMPLE_PATIENTS if p['id'] == patient_id), None)
+        patient = _PATIENTS_BY_ID.get(patient_id)
         if patient:
-            return jsonify(patient), 200
+            return json_response(patient)
         else:
-            return jsonify({"error": "Patient not found"}), 404
+            return json_response({"error": "Patient not found"}, 404)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}, 500)
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
-    return jsonify({"status": "healthy", "message": "Example API server is running"}), 200
+    return json_response({"status": "healthy", "message": "Example API server is running"})
 
 @app.route('/', methods=['GET'])
 def root():
     """Root endpoint with API information."""
-    return jsonify({
+    return json_response({
         "message": "Example Patient API Server",
         "endpoints": {
             "/api/Patient": "GET - List patients with optional filters (name, limit)",
@@ -105,7 +185,7 @@ def root():
             "patients_with_limit": "http://localhost:5000/api/Patient?name=Smith&limit=5",
             "specific_patient": "http://localhost:5000/patients/P001"
         }
-    }), 200
+    })
 
 if __name__ == '__main__':
     print("Starting Example Patient API Server...")
@@ -120,6 +200,10 @@ if __name__ == '__main__':
     print("  http://localhost:5001/patients?name=Smith&limit=5")
     print("\nTo use with MCP server, update config.py:")
     print('  "base_url": "http://localhost:5001"')
+    print("\nFor concurrent clients, run it with gunicorn instead:")
+    print("  gunicorn -c gunicorn_conf.py example_api_server:app")
+    print("\nSet FLASK_DEBUG=1 to enable the debugger and auto-reloader")
     print("\nPress Ctrl+C to stop the server")
     
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # The debugger and reloader slow every request; opt in with FLASK_DEBUG=1
+    app.run(host='0.0.0.0', port=5000, debug=os.environ.get("FLASK_DEBUG") == "1")
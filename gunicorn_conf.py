@@ -0,0 +1,27 @@
+"""
+Gunicorn configuration for serving the example patient API.
+
+Usage:
+    gunicorn -c gunicorn_conf.py example_api_server:app
+
+The gevent worker monkey-patches the standard library before the app is
+loaded, so each worker serves many concurrent requests cooperatively.
+"""
+
+import multiprocessing
+import os
+
+# Address to listen on (same port as the development server)
+bind = os.getenv("BIND", "0.0.0.0:5000")
+
+# Worker processes and the concurrent connections each one handles
+worker_class = "gevent"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_connections = 1000
+
+# Keep client connections open between requests
+keepalive = 5
+
+# Log requests and errors to stdout/stderr
+accesslog = "-"
+errorlog = "-"
@@ -11,11 +11,22 @@ Usage:
 - Configure in Claude Desktop with stdio transport
 """
 
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 from mcp.server.fastmcp import FastMCP
 from api_client import patient_api_client
 
+
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """Share one pooled API client across tool calls and close it on shutdown."""
+    try:
+        yield
+    finally:
+        await patient_api_client.aclose()
+
 # Initialize FastMCP server
-mcp = FastMCP("healthcare-mcp-server")
+mcp = FastMCP("healthcare-mcp-server", lifespan=lifespan)
 
 
 
@@ -27,7 +38,7 @@ async def getpatientlist(patient_name: str = None, limit: int = 10) -> str:
         patient_name: Filter by patient name (optional, partial matches supported)
         limit: Maximum number of patients to return (1-100, default: 10)
     """
-    # Call the API client to get patient list
+    # Call the API client to get patient list (reuses its pooled connections)
     return await patient_api_client.get_patient_list(patient_name=patient_name, limit=limit)
 
 if __name__ == "__main__":
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test script for name filtering in the example patient API server.
+The joined-string search is checked against a plain per-name loop.
+"""
+
+import example_api_server as server
+
+
+def use_patients(patients, threshold=server.NAME_SCAN_THRESHOLD):
+    """Point the server at other patient data, rebuilding the name index as at import."""
+    server.SAMPLE_PATIENTS = tuple(patients)
+    server._NAMES_LOWER = tuple(p['name'].lower() for p in server.SAMPLE_PATIENTS)
+    server.NAME_SCAN_THRESHOLD = threshold
+    server._NAMES_JOINED, server._NAME_STARTS = server._build_name_index(server._NAMES_LOWER)
+
+
+def simple_matches(query):
+    """Reference filter: every patient whose lowercased name contains query."""
+    return [p for p in server.SAMPLE_PATIENTS if query in p['name'].lower()]
+
+
+def check_queries(queries):
+    """Compare the server's matches with the reference filter for each query."""
+    for query in queries:
+        assert list(server._name_matches(query)) == simple_matches(query), query
+
+
+def test_joined_scan_on_sample_data():
+    """With the threshold lowered, the sample names are searched as one string."""
+    print("🧪 Testing joined-string scan on the sample patients")
+    original = server.SAMPLE_PATIENTS
+    use_patients(original, threshold=0)
+    assert server._NAME_STARTS
+    names = list(server._NAMES_LOWER)
+    queries = ["", "a", "an", "john", "smith", "amanda clark", "k", "clark", "j", "son",
+               "smith\nmary", "n\nm", "nobody", "amanda clark and more"]
+    queries += names + [name[1:] for name in names] + [name[:-1] for name in names]
+    check_queries(queries)
+    use_patients(original)
+    assert not server._NAME_STARTS
+    check_queries(queries)
+    print("✓ Joined-string scan matches the per-name loop")
+
+
+def test_joined_scan_above_threshold():
+    """Patient lists at the real threshold use the joined scan and match the loop."""
+    print("🧪 Testing joined-string scan above the threshold")
+    original = server.SAMPLE_PATIENTS
+    first = ["ann", "anna", "bob", "jo", "joan", "o'brien", "li", "x"]
+    last = ["lee", "leeson", "smith", "brown", "an", "annan"]
+    patients = [
+        {"id": f"P{i:05d}", "name": f"{first[i % len(first)]} {last[i // len(first) % len(last)]}{i % 7 or ''}"}
+        for i in range(server.NAME_SCAN_THRESHOLD + 500)
+    ]
+    use_patients(patients)
+    assert server._NAME_STARTS
+    check_queries(["", "an", "ann", "n a", "lee", "leeson", "o'brien", "x ann", "3",
+                   "li lee6", "x annan6", "brown\nann", "zzz"])
+    use_patients(original)
+    print("✓ Joined-string scan matches the per-name loop")
+
+
+if __name__ == "__main__":
+    print("🏥 Example API Server - Name Filter Testing")
+    print("=" * 60)
+
+    test_joined_scan_on_sample_data()
+    test_joined_scan_above_threshold()
+
+    print("\n🎉 All tests completed successfully!")
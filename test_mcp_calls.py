@@ -5,7 +5,7 @@ This simulates how Claude Desktop would call the MCP server.
 """
 
 import asyncio
-from mcp_server import list_tools, getpatientlist
+from mcp_server import mcp, lifespan, getpatientlist
 
 async def test_mcp_calls():
     """Test MCP server tool calls."""
@@ -13,37 +13,25 @@ async def test_mcp_calls():
     print("🚀 Testing MCP Server Tool Calls")
     print("=" * 50)
     
-    # Test 1: List all available tools
-    print("\n1. Listing all available tools:")
-    try:
-        tools_result = await list_tools()
-        print(tools_result)
-    except Exception as e:
-        print(f"Error: {e}")
+    # The calls are independent, so run them concurrently over the pooled client
+    calls = (
+        ("1. Listing all available tools:", mcp.list_tools()),
+        ("2. Getting all patients (no filter):", getpatientlist(limit=5)),
+        ("3. Getting patients filtered by name 'John':", getpatientlist(patient_name="John", limit=3)),
+        ("4. Getting patients filtered by name 'Smith':", getpatientlist(patient_name="Smith", limit=2)),
+    )
+    async with lifespan(mcp):
+        results = await asyncio.gather(*(call for _, call in calls), return_exceptions=True)
     
-    # Test 2: Get all patients (no filter)
-    print("\n2. Getting all patients (no filter):")
-    try:
-        patients_result = await getpatientlist(limit=5)
-        print(patients_result)
-    except Exception as e:
-        print(f"Error: {e}")
-    
-    # Test 3: Get patients filtered by name
-    print("\n3. Getting patients filtered by name 'John':")
-    try:
-        filtered_result = await getpatientlist(patient_name="John", limit=3)
-        print(filtered_result)
-    except Exception as e:
-        print(f"Error: {e}")
-    
-    # Test 4: Get patients with different name filter
-    print("\n4. Getting patients filtered by name 'Smith':")
-    try:
-        smith_result = await getpatientlist(patient_name="Smith", limit=2)
-        print(smith_result)
-    except Exception as e:
-        print(f"Error: {e}")
+    for (title, _), result in zip(calls, results):
+        print(f"\n{title}")
+        if isinstance(result, Exception):
+            print(f"Error: {result}")
+        elif isinstance(result, list):
+            for tool in result:
+                print(f"- {tool.name}: {tool.description}")
+        else:
+            print(result)
     
     print("\n" + "=" * 50)
     print("✅ MCP Server testing completed!")
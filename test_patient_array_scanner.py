@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test script for incremental decoding of streamed patient API responses.
+Every body is checked against decoding it in full with orjson.
+"""
+
+import asyncio
+import orjson
+from api_client import PatientAPIClient, _PatientArrayScanner, _SCAN_THRESHOLD
+
+
+def make_patients(count):
+    """Build patient records whose strings contain quotes, escapes and brackets."""
+    return [
+        {
+            "PatientId": f"P{i:05d}",
+            "Name": f'Patient "{i}" \\ [test] {{x}}',
+            "Age": 20 + i % 60,
+            "Diagnosis": "Asthma: \"mild\", see notes]}",
+            "Medications": ["Albuterol", "Claritin 10mg"],
+        }
+        for i in range(count)
+    ]
+
+
+class FakeResponse:
+    """Stand-in for a streamed httpx response that yields the body in fixed-size chunks."""
+
+    def __init__(self, body, chunk_size):
+        self.body = body
+        self.chunk_size = chunk_size
+        self.bytes_read = 0
+
+    async def aiter_bytes(self):
+        for start in range(0, len(self.body), self.chunk_size):
+            chunk = self.body[start:start + self.chunk_size]
+            self.bytes_read += len(chunk)
+            yield chunk
+
+
+def scan(body, chunk_size, limit):
+    """Feed a body to the scanner in chunks, as _read_json does, and return the scanner."""
+    scanner = _PatientArrayScanner()
+    for start in range(0, len(body), chunk_size):
+        scanner.feed(body[start:start + chunk_size])
+        if scanner.enough(limit):
+            break
+    return scanner
+
+
+def test_chunk_boundaries():
+    """Records split at every possible byte boundary decode like a full decode."""
+    print("🧪 Testing chunk boundaries")
+    patients = make_patients(3)
+    for body in (orjson.dumps(patients), orjson.dumps({"total": 3, "patients": patients})):
+        for chunk_size in range(1, len(body) + 1):
+            scanner = scan(body, chunk_size, limit=100)
+            assert scanner.enough(100), chunk_size
+            assert scanner.records == patients, chunk_size
+    print("✓ Every chunk size gives the fully decoded records")
+
+
+def test_escaped_quotes():
+    """Escaped quotes and backslashes at chunk ends do not end a string early."""
+    print("🧪 Testing escaped quotes")
+    patients = [{"Name": 'a\\"b', "Diagnosis": "\\\\"}, {"Name": '"]}', "Diagnosis": "\\"}]
+    body = orjson.dumps({"patients": patients})
+    for chunk_size in range(1, len(body) + 1):
+        assert scan(body, chunk_size, limit=100).records == patients, chunk_size
+    print("✓ Escaped quotes are handled across chunks")
+
+
+def test_patients_data_precedence():
+    """Only a "patients" array is read early; anything ambiguous needs the full decode."""
+    print("🧪 Testing patients/data precedence")
+    patients = make_patients(2)
+
+    # "patients" wins even when "data" comes first
+    body = orjson.dumps({"data": [{"Name": "other"}], "patients": patients})
+    assert scan(body, 7, limit=100).records == patients
+
+    # A "data" array alone, or a "patients" key that is not an array, is never conclusive
+    for wrapped in ({"data": patients}, {"patients": None, "data": patients}, {"patients": {"a": 1}}):
+        body = orjson.dumps(wrapped)
+        assert not scan(body, 7, limit=1).enough(1), wrapped
+
+    # Scalar records are left to the full decode
+    for items in ([1, 2, 3], ["a", "b"], [patients[0], 5], [patients[0], None, patients[1]]):
+        assert not scan(orjson.dumps(items), 5, limit=100).enough(100), items
+    print("✓ Precedence and fallbacks match a full decode")
+
+
+def test_read_json():
+    """Small bodies are decoded in one go; large ones stop reading at the limit."""
+    print("🧪 Testing _read_json")
+    client = PatientAPIClient()
+
+    async def read(body, limit):
+        response = FakeResponse(body, chunk_size=4096)
+        return await client._read_json(response, limit), response.bytes_read
+
+    cases = [
+        [1, 2, 3],
+        {"patients": None, "data": make_patients(2)},
+        {"data": make_patients(2), "total": 2},
+        {"patients": make_patients(5)},
+        make_patients(5),
+        {"PatientId": "P1"},
+    ]
+    for data in cases:
+        body = orjson.dumps(data)
+        assert asyncio.run(read(body, 100))[0] == client._decode_patients(body), data
+
+    patients = make_patients(2000)
+    body = orjson.dumps({"patients": patients})
+    assert len(body) > _SCAN_THRESHOLD * 2
+    records, bytes_read = asyncio.run(read(body, 10))
+    assert records[:10] == patients[:10]
+    assert bytes_read < len(body)
+
+    body = orjson.dumps({"data": patients})
+    records, bytes_read = asyncio.run(read(body, 10))
+    assert records == patients and bytes_read == len(body)
+    print("✓ _read_json matches a full decode and stops early on large bodies")
+
+
+if __name__ == "__main__":
+    print("🏥 Healthcare Chatbot - Patient Array Scanner Testing")
+    print("=" * 60)
+
+    test_chunk_boundaries()
+    test_escaped_quotes()
+    test_patients_data_precedence()
+    test_read_json()
+
+    print("\n🎉 All tests completed successfully!")
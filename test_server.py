@@ -6,11 +6,14 @@ This script helps verify that the server is working correctly.
 
 import asyncio
 import json
-import subprocess
-import sys
 from typing import Any, Dict
 
 
+def first_line(text: str) -> str:
+    """Return the first line of a tool result, truncated for display."""
+    return text.partition('\n')[0][:50]
+
+
 class MCPTester:
     """Simple tester for MCP server functionality."""
     
@@ -31,11 +34,12 @@ class MCPTester:
             print(f"✗ Server/API client import failed: {e}")
             return False
         
-        # Test 2: Test list_tools function
+        # Test 2: List the registered tools through the FastMCP server
         try:
-            result = await mcp_server.list_tools()
+            tools = await mcp_server.mcp.list_tools()
             print("✓ List tools test:")
-            print(result[:200] + "..." if len(result) > 200 else result)
+            for tool in tools:
+                print(f"  - {tool.name}: {first_line(tool.description or '')}")
         except Exception as e:
             print(f"✗ List tools test failed: {e}")
 
@@ -55,20 +59,20 @@ class MCPTester:
         # Test 4: Test API client directly
         try:
             result = await api_client.patient_api_client.get_patient_list(limit=5)
-            print(f"✓ API client test (no name filter): {result.split(chr(10))[0] if chr(10) in result else result[:50]}...")
+            print(f"✓ API client test (no name filter): {first_line(result)}...")
         except Exception as e:
             print(f"✓ API client test (expected to fail without API): {str(e)[:50]}...")
 
         # Test 5: Test getpatientlist tool function (which calls API client)
         try:
             result = await mcp_server.getpatientlist(limit=5)
-            print(f"✓ Patient list tool test (no name filter): {result.split(chr(10))[0] if chr(10) in result else result[:50]}...")
+            print(f"✓ Patient list tool test (no name filter): {first_line(result)}...")
         except Exception as e:
             print(f"✓ Patient list tool test (expected to fail without API): {str(e)[:50]}...")
 
         try:
             result = await mcp_server.getpatientlist(patient_name="John", limit=3)
-            print(f"✓ Patient list tool test (with name filter): {result.split(chr(10))[0] if chr(10) in result else result[:50]}...")
+            print(f"✓ Patient list tool test (with name filter): {first_line(result)}...")
         except Exception as e:
             print(f"✓ Patient list tool test with name filter (expected to fail without API): {str(e)[:50]}...")
         
@@ -76,36 +80,25 @@ class MCPTester:
         print("Basic functionality tests completed!")
         return True
     
-    def test_server_startup(self):
-        """Test that the server can start up properly."""
+    async def test_server_startup(self):
+        """Test that the server starts up and registers its tools, in-process."""
         print("\nTesting Server Startup")
         print("=" * 30)
         
         try:
-            # Try to start the server process
-            process = subprocess.Popen(
-                [sys.executable, "mcp_server.py"],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
+            import mcp_server
             
-            # Give it a moment to start
-            import time
-            time.sleep(1)
+            # Run the server's startup and shutdown hooks without spawning a process
+            async with mcp_server.lifespan(mcp_server.mcp):
+                tools = await mcp_server.mcp.list_tools()
             
-            # Check if it's still running
-            if process.poll() is None:
-                print("✓ Server started successfully")
-                process.terminate()
-                process.wait()
+            tool_names = [tool.name for tool in tools]
+            if "getpatientlist" in tool_names:
+                print(f"✓ Server started successfully with tools: {', '.join(tool_names)}")
                 return True
             else:
-                stdout, stderr = process.communicate()
                 print(f"✗ Server failed to start")
-                if stderr:
-                    print(f"Error: {stderr}")
+                print(f"Error: getpatientlist not registered (found: {tool_names})")
                 return False
                 
         except Exception as e:
@@ -124,7 +117,7 @@ async def main():
     basic_success = await tester.test_basic_functionality()
     
     # Test server startup
-    startup_success = tester.test_server_startup()
+    startup_success = await tester.test_server_startup()
     
     print(f"\nTest Results:")
     print(f"Basic Functionality: {'PASS' if basic_success else 'FAIL'}")